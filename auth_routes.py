@@ -1,13 +1,15 @@
 # Imports
 from fastapi import APIRouter, Response, Request, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from spotify_helpers import GetOrCreateUser
-from security import issue_session_jwt, verify_session_jwt, encrypt_token
+from security import issue_session_jwt, encrypt_token
+from session_auth import COOKIE_NAME, UserSnapshot, current_user, invalidate_session
+from spotify_client import SpotifyUnavailable, spotify
+from token_manager import token_manager
 from typing import Literal
 
-import os, datetime, requests
+import os, datetime, math, httpx
 
 # ----------------------------------------------------------------------------------
 # -- Authorization Routes
@@ -19,7 +21,6 @@ SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "https://synaptic-sound.com/callback")
 
-COOKIE_NAME = "ss_session"
 COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN", "synaptic-sound.com")
 COOKIE_SECURE = True
 COOKIE_SAMESITE = "lax"
@@ -41,33 +42,44 @@ def login():
     return {"auth_url": url}
 
 @router.get("/callback")
-def callback(code: str, response: Response, db: Session = Depends(get_db)):
-    token_res = requests.post(
-        "https://accounts.spotify.com/api/token",
-        data={
+async def callback(code: str, response: Response, db: AsyncSession = Depends(get_async_db)):
+    try:
+        token_res = await spotify.request_token({
             "grant_type": "authorization_code",
             "code": code,
             "redirect_uri": SPOTIFY_REDIRECT_URI,
             "client_id": SPOTIFY_CLIENT_ID,
             "client_secret": SPOTIFY_CLIENT_SECRET,
-        },
-    )
-    if token_res.status_code != 200:
-        raise HTTPException(status_code=400, detail="Token exchange failed.")
+        })
+        if token_res.status_code != 200:
+            raise HTTPException(status_code=400, detail="Token exchange failed.")
+
+        data = token_res.json()
+
+        access_token = data["access_token"]
+        refresh_token = data["refresh_token"]
 
-    data = token_res.json()
+        me_res = await spotify.get_me(access_token)
+        if me_res.status_code != 200:
+            raise HTTPException(status_code=502, detail="Spotify profile lookup failed.")
 
-    access_token = data["access_token"]
-    refresh_token = data["refresh_token"]
+        me = me_res.json()
+    except SpotifyUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail="Spotify is rate limiting us, try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after or 1))}
+        )
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Spotify unavailable.")
 
-    me = requests.get("https://api.spotify.com/v1/me", headers={"Authorization": f"Bearer {access_token}"}).json()
-    user = GetOrCreateUser(me["id"], db, display_name=me.get("display_name"))
+    user = await GetOrCreateUser(me["id"], db, display_name=me.get("display_name"))
     user.access_token = access_token
     if refresh_token:
         user.refresh_token_enc = encrypt_token(refresh_token)
 
     user.token_expires_at = datetime.datetime.now() + datetime.timedelta(seconds=data.get("expires_in", 3600))
-    db.commit(); db.refresh(user)
+    await db.commit(); await db.refresh(user)
+    token_manager.store(user.id, access_token, user.token_expires_at)
 
     jwt_cookie = issue_session_jwt(user.spotify_id)
 
@@ -81,23 +93,12 @@ def callback(code: str, response: Response, db: Session = Depends(get_db)):
     return {"ok": True, "display_name": user.display_name}
 
 @router.get("/session")
-def session(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get(COOKIE_NAME)
-    if not token:
-        raise HTTPException(status_code=401, detail="No session.")
-
-    spotify_id = verify_session_jwt(token)
-    if not spotify_id:
-        raise HTTPException(status_code=401, detail="Invalid session.")
-
-    user = db.query(User).filter_by(spotify_id=spotify_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found.")
-
-    return {"ok": True, "spotify_id": spotify_id, "display_name": user.display_name}
+async def session(user: UserSnapshot = Depends(current_user)):
+    return {"ok": True, "spotify_id": user.spotify_id, "display_name": user.display_name}
 
 @router.post("/logout")
-def logout(response: Response):
+async def logout(request: Request, response: Response):
+    invalidate_session(request.cookies.get(COOKIE_NAME))
     response.delete_cookie(key=COOKIE_NAME, domain=COOKIE_DOMAIN)
 
     return {"ok": True}
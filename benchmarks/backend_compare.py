@@ -0,0 +1,149 @@
+# Imports
+from pathlib import Path
+
+import argparse, json, os, resource, subprocess, sys, tempfile, time
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# -- Emotion Backend Comparison
+#
+# Runs each emotion backend in its own process over the same preprocessed
+# selfies and reports load time, resident memory, per-image and batched
+# latency, and how often its labels agree with the first (reference) backend.
+#
+#   python onnx_export.py --out models/emotion.onnx --quantize
+#   python benchmarks/backend_compare.py --image-dir selfies/ \
+#       --backend deepface --backend onnx:models/emotion.onnx --backend onnx:models/emotion.int8.onnx
+#
+# Without --image-dir it uses the synthetic faces from load_bench.py, which are
+# fine for latency and memory but say little about label agreement.
+# -----------------------------------------------------------------------------
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+    return 0.0
+
+def run_worker(spec: str, images_path: str, repeat: int, batch_size: int) -> dict:
+    name, _, model_path = spec.partition(":")
+    os.environ["EMOTION_BACKEND"] = name
+    if model_path:
+        os.environ["EMOTION_ONNX_PATH"] = model_path
+
+    with np.load(images_path) as archive:
+        images = [archive[k] for k in sorted(archive.files, key=int)]
+
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    sys.path.insert(0, str(ROOT))
+    from emotion_service import emotion_service
+
+    emotion_service.load()
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    labels, confidences, single_ms = [], [], []
+    for _ in range(repeat):
+        for img in images:
+            t = time.perf_counter()
+            result = emotion_service.analyze(img)
+            single_ms.append((time.perf_counter() - t) * 1000)
+            if len(labels) < len(images):
+                labels.append(result.mood)
+                confidences.append(result.confidence)
+
+    batch_ms = []
+    for i in range(0, len(images) - batch_size + 1, batch_size):
+        t = time.perf_counter()
+        emotion_service.analyze_batch(images[i:i + batch_size])
+        batch_ms.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "backend": spec,
+        "load_s": round(load_s, 3),
+        "rss_before_mb": round(rss_start, 1),
+        "rss_loaded_mb": round(rss_loaded, 1),
+        "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "single_p50_ms": round(float(np.percentile(single_ms, 50)), 2),
+        "single_p95_ms": round(float(np.percentile(single_ms, 95)), 2),
+        "batch_size": batch_size,
+        "batch_per_image_ms": round(float(np.mean(batch_ms)) / batch_size, 2) if batch_ms else None,
+        "labels": labels,
+        "confidences": confidences,
+    }
+
+def prepare_images(image_dir: str | None, count: int) -> list[np.ndarray]:
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(ROOT / "benchmarks"))
+    from image_pipeline import ImageRejected, prepare_selfie
+    from load_bench import load_selfies
+
+    images = []
+    for data in load_selfies(image_dir, count):
+        try:
+            images.append(prepare_selfie(data).image)
+        except ImageRejected as e:
+            print(f"Skipping image: {e}")
+
+    return images
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", action="append", default=None,
+                        help="deepface or onnx[:model.onnx]; first one is the reference (repeatable)")
+    parser.add_argument("--image-dir", type=str, default=None)
+    parser.add_argument("--count", type=int, default=64, help="synthetic images when no --image-dir")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--out", type=str, default=None)
+    parser.add_argument("--worker", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--images", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.images, args.repeat, args.batch_size)))
+        return
+
+    backends = args.backend or ["deepface", "onnx"]
+    images = prepare_images(args.image_dir, args.count)
+    if not images:
+        sys.exit("No usable images.")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        images_path = os.path.join(tmp, "images.npz")
+        np.savez(images_path, **{str(i): img for i, img in enumerate(images)})
+
+        # One process per backend so load time and RSS aren't polluted by the previous one.
+        for spec in backends:
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", spec, "--images", images_path,
+                 "--repeat", str(args.repeat), "--batch-size", str(args.batch_size)],
+                cwd=ROOT, check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+    reference = results[0]
+    for r in results:
+        same = [a == b for a, b in zip(r["labels"], reference["labels"])]
+        conf_diff = [abs(a - b) for a, b in zip(r["confidences"], reference["confidences"])]
+        r["label_agreement"] = round(sum(same) / len(same), 4)
+        r["mean_confidence_diff"] = round(float(np.mean(conf_diff)), 2)
+
+    print(f"\n{len(images)} images, reference: {reference['backend']}")
+    print(f"{'backend':<36}{'load s':>8}{'rss MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'batch/img':>11}{'agree':>8}")
+    for r in results:
+        print(f"{r['backend']:<36}{r['load_s']:>8.2f}{r['rss_loaded_mb']:>9.0f}{r['single_p50_ms']:>9.2f}"
+              f"{r['single_p95_ms']:>9.2f}{r['batch_per_image_ms'] or 0:>11.2f}{r['label_agreement']:>8.1%}")
+
+    if args.out:
+        summary = [{k: v for k, v in r.items() if k not in ("labels", "confidences")} for r in results]
+        Path(args.out).write_text(json.dumps({"images": len(images), "results": summary}, indent=2))
+
+if __name__ == "__main__":
+    main()
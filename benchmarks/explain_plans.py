@@ -0,0 +1,170 @@
+# Imports
+from pathlib import Path
+
+import argparse, base64, os, random, secrets, sys
+from datetime import timedelta
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("ENCRYPTION_KEY", base64.b64encode(secrets.token_bytes(32)).decode())
+os.environ.setdefault("SESSION_SECRET", secrets.token_hex(32))
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, select
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.ext.compiler import compiles
+
+from database import engine
+from models import User, MoodEntry, Track, TrackLog, Playlist, Job, MoodDailyRollup, MoodTotal, UserTotals, utcnow
+from mood_routes import EMOJI_TO_MOOD
+from queries import history_query, recent_tracks_query
+from insights import history_frame_query
+import rollups
+
+# -----------------------------------------------------------------------------
+# -- EXPLAIN Plans
+#
+# Migrates the database at DATABASE_URL to head, optionally seeds it, and dumps
+# the query plan of every per-route query. Plans that fall back to a full table
+# scan are listed at the end; --fail-on-scan turns them into a non-zero exit so
+# an index regression fails CI.
+#
+#   DATABASE_URL=sqlite:///explain.db python benchmarks/explain_plans.py --seed
+#   DATABASE_URL=postgresql://... python benchmarks/explain_plans.py --seed --analyze
+# -----------------------------------------------------------------------------
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+@compiles(Explain, "postgresql")
+def _explain_postgresql(element, compiler, **kw):
+    opts = "(ANALYZE, BUFFERS) " if element.analyze else ""
+
+    return "EXPLAIN " + opts + compiler.process(element.statement, **kw)
+
+@compiles(Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+def _is_full_scan(dialect: str, plan: list[str]) -> bool:
+    if dialect == "postgresql":
+        return any("Seq Scan" in line for line in plan)
+
+    # SQLite reports "SCAN <table>" for full scans and "SEARCH ... USING INDEX" for index lookups.
+    return any(line.split()[:1] == ["SCAN"] and "USING" not in line for line in plan)
+
+def seed(users: int, entries_per_user: int, tracks_per_user: int) -> None:
+    moods = sorted(set(EMOJI_TO_MOOD.values()))
+    emojis = {m: e for e, m in EMOJI_TO_MOOD.items()}
+    now = utcnow()
+    rng = random.Random(42)
+
+    with engine.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id),
+            [{"spotify_id": f"explain-{secrets.token_hex(6)}", "display_name": f"User {i}", "auto_create_enabled": True}
+             for i in range(users)],
+        ).scalars().all()
+
+        known = set(conn.execute(select(Track.id)).scalars())
+        catalog = [
+            {"id": f"trk{n}", "name": f"Track {n}", "artist_name": f"Artist {n % 400}", "album_name": f"Album {n % 900}"}
+            for n in range(5001) if f"trk{n}" not in known
+        ]
+        if catalog:
+            conn.execute(insert(Track), catalog)
+
+        for user_id in user_ids:
+            entries = []
+            for i in range(entries_per_user):
+                mood = rng.choice(moods)
+                entries.append({
+                    "user_id": user_id, "emoji": emojis[mood], "detected_mood": mood,
+                    "created_at": now - timedelta(minutes=37 * i + rng.randint(0, 30)),
+                })
+            entry_ids = conn.execute(
+                insert(MoodEntry).returning(MoodEntry.id, sort_by_parameter_order=True), entries
+            ).scalars().all()
+
+            # Tracks are logged against mood entries, as the side-effect job does, so the
+            # planner sees a selective mood_id.
+            conn.execute(insert(TrackLog), [
+                {"user_id": user_id, "mood_id": entry_ids[i], "track_id": f"trk{rng.randint(0, 5000)}",
+                 "created_at": entries[i]["created_at"]}
+                for i in range(min(tracks_per_user, len(entry_ids)))
+            ])
+            conn.execute(insert(Playlist), [
+                {"user_id": user_id, "detected_mood": m, "playlist_name": f"{m.capitalize()} Vibes 🎧",
+                 "playlist_url": f"https://open.spotify.com/playlist/{user_id}{m}"}
+                for m in moods
+            ])
+
+        rollups.rebuild(conn)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+def route_queries(user_id: int, spotify_id: str) -> dict:
+    return {
+        "session: user by spotify_id": select(User).where(User.spotify_id == spotify_id),
+        "GET /mood/history": history_query(user_id),
+        "GET /mood/history?limit=50": history_query(user_id).limit(51),
+        "GET /mood/history?days=30": history_query(user_id, days=30),
+        "GET /mood/stats": select(UserTotals.mood_count, UserTotals.track_count, MoodTotal.detected_mood, MoodTotal.entry_count)
+            .outerjoin(MoodTotal, MoodTotal.user_id == UserTotals.user_id).where(UserTotals.user_id == user_id),
+        "GET /mood/trends": select(MoodDailyRollup.day, MoodDailyRollup.detected_mood, MoodDailyRollup.entry_count)
+            .where(MoodDailyRollup.user_id == user_id).order_by(MoodDailyRollup.day),
+        "GET /mood/tracks": recent_tracks_query(user_id),
+        "GET /mood/insights": history_frame_query(user_id),
+        "playlist registry lookup": select(Playlist.id, Playlist.playlist_url)
+            .where(Playlist.user_id == user_id, Playlist.detected_mood == "happy").order_by(Playlist.id).limit(1),
+        "job claim": select(Job).where(Job.status.in_(("queued", "retry")), Job.run_after <= utcnow())
+            .order_by(Job.run_after).limit(1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", action="store_true", help="insert synthetic users/entries before explaining")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--entries-per-user", type=int, default=5000)
+    parser.add_argument("--tracks-per-user", type=int, default=1000)
+    parser.add_argument("--analyze", action="store_true", help="Postgres only: EXPLAIN (ANALYZE, BUFFERS)")
+    parser.add_argument("--fail-on-scan", action="store_true")
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+
+    command.upgrade(Config(str(ROOT / "alembic.ini")), "head")
+    if args.seed:
+        seed(args.users, args.entries_per_user, args.tracks_per_user)
+
+    dialect = engine.dialect.name
+    lines, scans = [], []
+    with engine.connect() as conn:
+        user = conn.execute(select(User.id, User.spotify_id).order_by(User.id.desc()).limit(1)).first()
+        if user is None:
+            sys.exit("No users in the database; run with --seed.")
+
+        for name, stmt in route_queries(user.id, user.spotify_id).items():
+            # Postgres returns one text column per line; SQLite's last column is the step detail.
+            plan = [str(row[-1]) for row in conn.execute(Explain(stmt, analyze=args.analyze))]
+            if _is_full_scan(dialect, plan):
+                scans.append(name)
+
+            lines += [f"== {name}", *plan, ""]
+
+    lines.append("Full scans: " + (", ".join(scans) if scans else "none"))
+    report = "\n".join(lines)
+    print(report)
+    if args.out:
+        Path(args.out).write_text(report)
+
+    if args.fail_on_scan and scans:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
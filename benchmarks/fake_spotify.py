@@ -0,0 +1,126 @@
+# Imports
+from fastapi import FastAPI, Form, Header, HTTPException, Request, Response
+
+import argparse, asyncio, hashlib, os, random
+import uvicorn
+
+# -----------------------------------------------------------------------------
+# -- Fake Spotify
+#
+# Local stand-in for the parts of the Spotify accounts and Web APIs the service
+# calls, with configurable latency so benchmarks don't depend on (or hammer) the
+# real thing. Point the app at it with SPOTIFY_ACCOUNTS_URL=http://host:port and
+# SPOTIFY_API_URL=http://host:port/v1.
+#
+# An authorization code of "<spotify_id>" yields an access token "tok:<spotify_id>",
+# and /v1/me resolves that token back to the same user.
+#
+#   python benchmarks/fake_spotify.py --port 9000 --latency-ms 80 --jitter-ms 20
+# -----------------------------------------------------------------------------
+
+LATENCY_MS = float(os.getenv("FAKE_SPOTIFY_LATENCY_MS", "50"))
+JITTER_MS = float(os.getenv("FAKE_SPOTIFY_JITTER_MS", "10"))
+NOTHING_PLAYING_RATE = float(os.getenv("FAKE_SPOTIFY_NOTHING_PLAYING_RATE", "0.1"))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_SPOTIFY_RATE_LIMIT_RATE", "0"))    # fraction of calls answered 429
+RETRY_AFTER_SEC = int(os.getenv("FAKE_SPOTIFY_RETRY_AFTER_SEC", "1"))
+
+app = FastAPI(title="Fake Spotify")
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    if RATE_LIMIT_RATE and random.random() < RATE_LIMIT_RATE:
+        return Response(status_code=429, headers={"Retry-After": str(RETRY_AFTER_SEC)})
+
+    return await call_next(request)
+
+async def _delay() -> None:
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+
+def _spotify_id(authorization: str | None) -> str:
+    if not authorization or not authorization.startswith("Bearer tok:"):
+        raise HTTPException(status_code=401, detail="Invalid access token")
+
+    return authorization.removeprefix("Bearer tok:")
+
+@app.post("/api/token")
+async def token(grant_type: str = Form(...), code: str | None = Form(None), refresh_token: str | None = Form(None)):
+    await _delay()
+    spotify_id = code if grant_type == "authorization_code" else (refresh_token or "").removeprefix("refresh:")
+    if not spotify_id:
+        raise HTTPException(status_code=400, detail="invalid_grant")
+
+    return {
+        "access_token": f"tok:{spotify_id}",
+        "refresh_token": f"refresh:{spotify_id}",
+        "token_type": "Bearer",
+        "expires_in": 3600,
+    }
+
+@app.get("/v1/me")
+async def me(authorization: str | None = Header(None)):
+    await _delay()
+    spotify_id = _spotify_id(authorization)
+
+    return {"id": spotify_id, "display_name": f"Bench {spotify_id}", "email": f"{spotify_id}@example.com"}
+
+@app.get("/v1/me/player/currently-playing")
+async def currently_playing(authorization: str | None = Header(None)):
+    await _delay()
+    _spotify_id(authorization)
+    if random.random() < NOTHING_PLAYING_RATE:
+        return Response(status_code=204)
+
+    n = random.randint(0, 4999)
+    track_id = hashlib.md5(str(n).encode()).hexdigest()[:22]
+
+    return {
+        "is_playing": True,
+        "item": {
+            "id": track_id,
+            "name": f"Track {n}",
+            "artists": [{"name": f"Artist {n % 400}"}],
+            "album": {"name": f"Album {n % 900}", "images": [{"url": f"https://i.scdn.co/image/{track_id}"}]},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        },
+    }
+
+@app.post("/v1/users/{spotify_id}/playlists", status_code=201)
+async def create_playlist(spotify_id: str, request: Request, authorization: str | None = Header(None)):
+    await _delay()
+    if _spotify_id(authorization) != spotify_id:
+        raise HTTPException(status_code=403, detail="Cannot create playlists for another user")
+
+    body = await request.json()
+    playlist_id = hashlib.md5(f"{spotify_id}:{body['name']}:{random.random()}".encode()).hexdigest()[:22]
+
+    return {
+        "id": playlist_id,
+        "name": body["name"],
+        "description": body.get("description"),
+        "public": body.get("public", True),
+        "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"},
+    }
+
+@app.delete("/v1/playlists/{playlist_id}/followers")
+async def unfollow_playlist(playlist_id: str, authorization: str | None = Header(None)):
+    await _delay()
+    _spotify_id(authorization)
+
+    return Response(status_code=200)
+
+def main() -> None:
+    global LATENCY_MS, JITTER_MS, RATE_LIMIT_RATE
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    parser.add_argument("--rate-limit-rate", type=float, default=RATE_LIMIT_RATE)
+    args = parser.parse_args()
+
+    LATENCY_MS, JITTER_MS, RATE_LIMIT_RATE = args.latency_ms, args.jitter_ms, args.rate_limit_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Imports
+from pathlib import Path
+
+import argparse, base64, json, os, secrets, signal, subprocess, sys, tempfile, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from startup_bench import _free_port, _wait_for
+
+# -----------------------------------------------------------------------------
+# -- Fork Memory Benchmark
+#
+# Starts serve.py with 1, 2 and 4 workers, with the model preloaded in the
+# parent and with each worker loading its own, and reports per-worker memory
+# from /proc/<pid>/smaps_rollup once it stops changing:
+#   USS  pages only that worker maps (what it really costs)
+#   PSS  its share of everything, shared pages divided among their users
+#   RSS  everything it maps, shared pages counted in full
+#
+#   python onnx_export.py --out models/emotion.onnx
+#   EMOTION_BACKEND=onnx python benchmarks/fork_memory_bench.py --out bench_fork.json
+#
+# Linux only.
+# -----------------------------------------------------------------------------
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def _memory_kb(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+def _children(pid: int) -> list[int]:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; ppid is the second field after it.
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            pids.append(int(entry))
+
+    return sorted(pids)
+
+def _settled_sample(parent: int, workers: int, deadline: float, tolerance: float = 0.01) -> dict | None:
+    # Workers that load their own model keep growing for a while after the first one is ready.
+    previous = None
+    while time.perf_counter() < deadline:
+        pids = _children(parent)
+        if len(pids) >= workers:
+            sample = {"parent": _memory_kb(parent), "workers": [_memory_kb(p) for p in pids[:workers]]}
+            total = sum(w["uss"] for w in sample["workers"])
+            if previous is not None and abs(total - previous) <= tolerance * max(previous, 1):
+                return sample
+            previous = total
+        time.sleep(1.0)
+
+    return None
+
+def run_once(workers: int, preload: bool, timeout: float, env: dict) -> dict:
+    port = _free_port()
+    cmd = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    if not preload:
+        cmd.append("--no-preload")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        ready = _wait_for(f"http://127.0.0.1:{port}/.well-known/ready", deadline)
+        sample = _settled_sample(proc.pid, workers, deadline) if ready else None
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+
+    if sample is None:
+        return {"workers": workers, "preload": preload, "error": "timed out"}
+
+    per_worker = sample["workers"]
+
+    def mean_mb(key: str) -> float:
+        return round(sum(w[key] for w in per_worker) / len(per_worker) / 1024, 1)
+
+    return {
+        "workers": workers,
+        "preload": preload,
+        "ready_s": round(ready - start, 2),
+        "parent_rss_mb": round(sample["parent"]["rss"] / 1024, 1),
+        "worker_uss_mb": mean_mb("uss"),
+        "worker_pss_mb": mean_mb("pss"),
+        "worker_rss_mb": mean_mb("rss"),
+        "total_pss_mb": round((sample["parent"]["pss"] + sum(w["pss"] for w in per_worker)) / 1024, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as db_dir:
+        env = {
+            **os.environ,
+            "DATABASE_URL": os.getenv("DATABASE_URL", f"sqlite:///{db_dir}/bench.db"),
+            "ENCRYPTION_KEY": os.getenv("ENCRYPTION_KEY", base64.b64encode(secrets.token_bytes(32)).decode()),
+            "SESSION_SECRET": os.getenv("SESSION_SECRET", secrets.token_hex(32)),
+            # In-process inference in both modes, so every model copy is inside a measured worker.
+            "INFERENCE_WORKERS": "0",
+        }
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        for preload in (True, False):
+            for workers in args.workers:
+                results.append(run_once(workers, preload, args.timeout, env))
+                print(json.dumps(results[-1]))
+
+    print(f"\nbackend: {os.getenv('EMOTION_BACKEND', 'deepface')}")
+    print(f"{'preload':<9}{'workers':>8}{'USS MB':>9}{'PSS MB':>9}{'RSS MB':>9}{'total PSS':>11}")
+    for r in results:
+        if "error" in r:
+            print(f"{str(r['preload']):<9}{r['workers']:>8}  {r['error']}")
+            continue
+        print(f"{str(r['preload']):<9}{r['workers']:>8}{r['worker_uss_mb']:>9.0f}{r['worker_pss_mb']:>9.0f}"
+              f"{r['worker_rss_mb']:>9.0f}{r['total_pss_mb']:>11.0f}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
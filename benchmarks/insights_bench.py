@@ -0,0 +1,92 @@
+# Imports
+from pathlib import Path
+
+import argparse, base64, json, os, secrets, statistics, sys, time
+from datetime import datetime, timedelta, timezone
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ENCRYPTION_KEY", base64.b64encode(secrets.token_bytes(32)).decode())
+os.environ.setdefault("SESSION_SECRET", secrets.token_hex(32))
+
+import numpy as np
+
+from insights import InsightsCache, insights_from_rows
+from mood_routes import EMOJI_TO_MOOD
+
+# -----------------------------------------------------------------------------
+# -- Insights Benchmark
+#
+# Times /mood/insights' computation (DataFrame build + every aggregate) on
+# synthetic histories shaped like history_frame_query's rows, and the cached
+# lookup that serves repeat requests. The query itself is covered by
+# explain_plans.py.
+#
+#   python benchmarks/insights_bench.py --sizes 10000 100000 250000 --tz Europe/Berlin
+# -----------------------------------------------------------------------------
+
+def synthetic_rows(n: int, seed: int = 0) -> list[tuple]:
+    rng = np.random.default_rng(seed)
+    moods = sorted(set(EMOJI_TO_MOOD.values()))
+    # A few check-ins a day, with gaps from minutes to a couple of days.
+    gaps = rng.exponential(scale=6 * 3600, size=n).astype(int)
+    start = datetime.now(timezone.utc) - timedelta(seconds=int(gaps.sum()))
+    offsets = np.cumsum(gaps)
+    mood_idx = rng.integers(0, len(moods), size=n)
+    # Roughly a third of entries have a logged track, drawn from a long tail of artists.
+    artist_idx = np.where(rng.random(n) < 0.35, rng.zipf(1.3, size=n) % 2000, -1)
+
+    return [
+        (start + timedelta(seconds=int(o)), moods[m], f"Artist {a}" if a >= 0 else None)
+        for o, m, a in zip(offsets, mood_idx, artist_idx)
+    ]
+
+def run(size: int, repeat: int, tz: str) -> dict:
+    rows = synthetic_rows(size)
+
+    compute_ms = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = insights_from_rows(rows, tz)
+        compute_ms.append((time.perf_counter() - start) * 1000)
+
+    cache = InsightsCache()
+    params = (tz, 7, 90)
+    cache.put(1, cache.generation(1), params, result)
+    start = time.perf_counter()
+    for _ in range(1000):
+        cache.get(1, params)
+    hit_us = (time.perf_counter() - start) * 1000
+
+    return {
+        "entries": size,
+        "compute_p50_ms": round(statistics.median(compute_ms), 1),
+        "compute_max_ms": round(max(compute_ms), 1),
+        "cache_hit_us": round(hit_us, 2),
+        "response_kb": round(len(json.dumps(result)) / 1024, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 250000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tz", type=str, default="UTC")
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.append(run(size, args.repeat, args.tz))
+        print(json.dumps(results[-1]))
+
+    print(f"\n{'entries':>9}{'p50 ms':>10}{'max ms':>10}{'hit us':>9}{'KB':>8}")
+    for r in results:
+        print(f"{r['entries']:>9}{r['compute_p50_ms']:>10.1f}{r['compute_max_ms']:>10.1f}"
+              f"{r['cache_hit_us']:>9.2f}{r['response_kb']:>8.1f}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+# Imports
+from pathlib import Path
+
+import argparse, asyncio, base64, json, os, platform, random, secrets, socket, subprocess, sys, tempfile, time
+import cv2
+import httpx
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# -- Load Benchmark
+#
+# Boots benchmarks/fake_spotify.py and `uvicorn main:app` against SQLite (default)
+# or DATABASE_URL, logs users in through /auth/callback, then drives a weighted
+# mix of mood endpoints at each concurrency level for a fixed duration. Writes
+# p50/p95/p99 latency and throughput per endpoint as JSON; with --baseline it
+# compares against a previous run and exits non-zero on regressions.
+#
+#   python benchmarks/load_bench.py --concurrency 1,8,32 --duration 20 --out load.json
+#   python benchmarks/load_bench.py --baseline load.json --max-regression 15
+# -----------------------------------------------------------------------------
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MIX = "emoji=40,selfie=10,history=30,stats=10,trends=10"
+EMOJIS = ["😊", "😔", "🔥", "😎", "❤️", "😤", "😢", "🤔", "😌", "😩", "🤩", "😴", "🤗", "🤯"]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for(url: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def _parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+
+    return mix
+
+def synthetic_faces(count: int, size: int = 640, seed: int = 7) -> list[bytes]:
+    # Face-like drawings: enough structure for the detector to find (or reject) a face without
+    # shipping real photos with the repo. Use --selfie-dir for real images.
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        img = np.full((size, size, 3), rng.integers(150, 230, 3), dtype=np.uint8)
+        cx, cy = size // 2 + int(rng.integers(-30, 30)), size // 2 + int(rng.integers(-30, 30))
+        skin = tuple(int(c) for c in rng.integers([80, 120, 170], [140, 180, 240]))
+        cv2.ellipse(img, (cx, cy), (size // 5, size // 4), 0, 0, 360, skin, -1)
+        for dx in (-size // 12, size // 12):
+            cv2.ellipse(img, (cx + dx, cy - size // 16), (size // 40, size // 70), 0, 0, 360, (40, 30, 30), -1)
+        smile = int(rng.integers(-20, 40))
+        cv2.ellipse(img, (cx, cy + size // 10), (size // 14, max(2, size // 40 + smile // 4)), 0, 0, 180, (60, 40, 150), 3)
+        img = np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+        images.append(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+
+    return images
+
+def load_selfies(path: str | None, count: int) -> list[bytes]:
+    if not path:
+        return synthetic_faces(count)
+
+    files = sorted(p for p in Path(path).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    if not files:
+        raise SystemExit(f"No .jpg/.png files in {path}")
+
+    return [p.read_bytes() for p in files]
+
+# -- Operations: each takes (client, cookie, selfies) and returns the response.
+
+async def op_emoji(client: httpx.AsyncClient, cookies: dict, selfies: list[bytes]) -> httpx.Response:
+    return await client.post("/mood/emoji", data={"emoji": random.choice(EMOJIS)}, cookies=cookies)
+
+async def op_selfie(client: httpx.AsyncClient, cookies: dict, selfies: list[bytes]) -> httpx.Response:
+    files = {"file": ("selfie.jpg", random.choice(selfies), "image/jpeg")}
+    return await client.post("/mood/selfie", files=files, cookies=cookies)
+
+async def op_history(client: httpx.AsyncClient, cookies: dict, selfies: list[bytes]) -> httpx.Response:
+    return await client.get("/mood/history", params={"limit": 50}, cookies=cookies)
+
+async def op_stats(client: httpx.AsyncClient, cookies: dict, selfies: list[bytes]) -> httpx.Response:
+    return await client.get("/mood/stats", cookies=cookies)
+
+async def op_trends(client: httpx.AsyncClient, cookies: dict, selfies: list[bytes]) -> httpx.Response:
+    return await client.get("/mood/trends", cookies=cookies)
+
+OPERATIONS = {
+    "emoji": op_emoji,
+    "selfie": op_selfie,
+    "history": op_history,
+    "stats": op_stats,
+    "trends": op_trends,
+}
+
+async def login(client: httpx.AsyncClient, spotify_id: str) -> dict:
+    r = await client.get("/auth/callback", params={"code": spotify_id})
+    r.raise_for_status()
+    # The session cookie is scoped to the production domain, so read it off the header directly.
+    name, value = r.headers["set-cookie"].split(";", 1)[0].split("=", 1)
+
+    return {name: value}
+
+async def prefill(client: httpx.AsyncClient, sessions: list[dict], entries: int) -> None:
+    sem = asyncio.Semaphore(16)
+
+    async def one(cookies):
+        async with sem:
+            await op_emoji(client, cookies, [])
+
+    await asyncio.gather(*(one(c) for c in sessions for _ in range(entries)))
+
+def summarize(samples: list[tuple[float, bool]], elapsed: float) -> dict:
+    if not samples:
+        return {"count": 0, "errors": 0, "rps": 0.0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+
+    latencies = np.array([s[0] for s in samples]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+    return {
+        "count": len(samples),
+        "errors": sum(1 for s in samples if not s[1]),
+        "rps": round(len(samples) / elapsed, 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+async def run_level(base: str, sessions: list[dict], selfies: list[bytes], mix: dict[str, float],
+                    concurrency: int, duration: float, warmup: float) -> dict:
+    names, weights = list(mix), list(mix.values())
+    samples: dict[str, list[tuple[float, bool]]] = {name: [] for name in names}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        loop = asyncio.get_running_loop()
+        measure_from = loop.time() + warmup
+        stop_at = measure_from + duration
+
+        async def user(i: int):
+            rng = random.Random(i)
+            cookies = sessions[i % len(sessions)]
+            while loop.time() < stop_at:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    r = await OPERATIONS[name](client, cookies, selfies)
+                    ok = r.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if loop.time() >= measure_from:
+                    samples[name].append((time.perf_counter() - start, ok))
+
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+
+    result = {name: summarize(s, duration) for name, s in samples.items()}
+    result["all"] = summarize([x for s in samples.values() for x in s], duration)
+
+    return result
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    print(f"\n{'level':<8}{'op':<10}{'p95 base':>10}{'p95 now':>10}{'Δ%':>8}{'rps base':>10}{'rps now':>10}{'Δ%':>8}")
+    for level, ops in current["results"].items():
+        for op, now in ops.items():
+            base = baseline.get("results", {}).get(level, {}).get(op)
+            if not base or not base["count"] or not now["count"]:
+                continue
+
+            p95_delta = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+            rps_delta = (now["rps"] - base["rps"]) / base["rps"] * 100
+            print(f"{level:<8}{op:<10}{base['p95_ms']:>10.1f}{now['p95_ms']:>10.1f}{p95_delta:>8.1f}"
+                  f"{base['rps']:>10.1f}{now['rps']:>10.1f}{rps_delta:>8.1f}")
+            if p95_delta > max_regression or rps_delta < -max_regression:
+                failures.append(f"{level}/{op}: p95 {p95_delta:+.1f}%, rps {rps_delta:+.1f}%")
+
+    return failures
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=str, default="1,8,32")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each level")
+    parser.add_argument("--mix", type=str, default=DEFAULT_MIX)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--prefill", type=int, default=200, help="emoji entries per user before measuring")
+    parser.add_argument("--selfie-dir", type=str, default=None)
+    parser.add_argument("--spotify-latency-ms", type=float, default=50.0)
+    parser.add_argument("--spotify-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=str, default=None)
+    parser.add_argument("--baseline", type=str, default=None)
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed %% p95/rps regression vs baseline")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    mix = _parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    selfies = load_selfies(args.selfie_dir, 16) if "selfie" in mix else []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spotify_port, app_port = _free_port(), _free_port()
+        env = {
+            **os.environ,
+            "DATABASE_URL": os.getenv("DATABASE_URL", f"sqlite:///{tmp}/load.db"),
+            "ENCRYPTION_KEY": os.getenv("ENCRYPTION_KEY", base64.b64encode(secrets.token_bytes(32)).decode()),
+            "SESSION_SECRET": os.getenv("SESSION_SECRET", secrets.token_hex(32)),
+            "SPOTIFY_ACCOUNTS_URL": f"http://127.0.0.1:{spotify_port}",
+            "SPOTIFY_API_URL": f"http://127.0.0.1:{spotify_port}/v1",
+            "SPOTIFY_CLIENT_ID": "bench", "SPOTIFY_CLIENT_SECRET": "bench",
+        }
+
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        procs = [
+            subprocess.Popen(
+                [sys.executable, str(ROOT / "benchmarks" / "fake_spotify.py"), "--port", str(spotify_port),
+                 "--latency-ms", str(args.spotify_latency_ms), "--jitter-ms", str(args.spotify_jitter_ms)],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ),
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port)],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ),
+        ]
+        try:
+            base = f"http://127.0.0.1:{app_port}"
+            _wait_for(f"http://127.0.0.1:{spotify_port}/docs", args.startup_timeout)
+            _wait_for(f"{base}/.well-known/health", args.startup_timeout)
+            if "selfie" in mix:
+                _wait_for(f"{base}/.well-known/ready", args.startup_timeout)
+
+            async def run() -> dict:
+                async with httpx.AsyncClient(base_url=base, timeout=60) as client:
+                    sessions = [await login(client, f"bench-user-{i}") for i in range(args.users)]
+                    if args.prefill:
+                        await prefill(client, sessions, args.prefill)
+
+                results = {}
+                for c in levels:
+                    results[f"c{c}"] = await run_level(base, sessions, selfies, mix, c, args.duration, args.warmup)
+                    print(json.dumps({"concurrency": c, "all": results[f"c{c}"]["all"]}))
+
+                return results
+
+            results = asyncio.run(run())
+        finally:
+            for p in procs:
+                p.terminate()
+                p.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "database": "sqlite" if "DATABASE_URL" not in os.environ else env["DATABASE_URL"].split(":", 1)[0],
+            "mix": mix, "users": args.users, "prefill": args.prefill, "duration_s": args.duration,
+            "spotify_latency_ms": args.spotify_latency_ms, "selfies": "synthetic" if not args.selfie_dir else args.selfie_dir,
+            "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        failures = compare(report, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        if failures:
+            print("\nRegressions:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
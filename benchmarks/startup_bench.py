@@ -0,0 +1,86 @@
+# Imports
+from pathlib import Path
+
+import argparse, base64, json, os, secrets, socket, subprocess, sys, tempfile, time
+import httpx
+
+# -----------------------------------------------------------------------------
+# -- Startup Benchmark
+#
+# Boots `uvicorn main:app` and measures time-to-first-response on /.well-known/health,
+# with the emotion model warming in the background (EMOTION_WARMUP=1) and without it
+# (EMOTION_WARMUP=0), plus how long the warm-up takes to report ready.
+#
+#   python benchmarks/startup_bench.py --runs 3 --out bench_output.txt
+# -----------------------------------------------------------------------------
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for(url: str, deadline: float, ok_status: int = 200) -> float | None:
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == ok_status:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+
+    return None
+
+def run_once(warmup: bool, timeout: float, db_dir: str) -> dict:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": os.getenv("DATABASE_URL", f"sqlite:///{db_dir}/bench.db"),
+        "ENCRYPTION_KEY": os.getenv("ENCRYPTION_KEY", base64.b64encode(secrets.token_bytes(32)).decode()),
+        "SESSION_SECRET": os.getenv("SESSION_SECRET", secrets.token_hex(32)),
+        "EMOTION_WARMUP": "1" if warmup else "0",
+    }
+
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = start + timeout
+        first = _wait_for(f"{base}/.well-known/health", deadline)
+        ready = _wait_for(f"{base}/.well-known/ready", deadline) if warmup else None
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    return {
+        "warmup": warmup,
+        "first_response_s": round(first - start, 3) if first else None,
+        "model_ready_s": round(ready - start, 3) if ready else None,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as db_dir:
+        for warmup in (False, True):
+            for _ in range(args.runs):
+                results.append(run_once(warmup, args.timeout, db_dir))
+                print(json.dumps(results[-1]))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
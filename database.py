@@ -1,6 +1,9 @@
 # Imports
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import Pool, QueuePool, AsyncAdaptedQueuePool
+from metrics import instrument_engine, timed_pool
 
 import os
 
@@ -15,13 +18,60 @@ connect_args = {}
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+def _pool_options(url: URL, poolclass: type[Pool]) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {}
+
+    return {
+        "poolclass": poolclass,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+def _async_url(url: URL) -> URL:
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+
+    if backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg spells libpq's sslmode as ssl.
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+
+    return url
+
+_url = make_url(DATABASE_URL)
+
+# Sync engine: migrations, CLI tools and anything running outside the event loop.
+engine = create_engine(_url, pool_pre_ping=True, connect_args=connect_args,
+                       **_pool_options(_url, timed_pool(QueuePool, "sync")))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# Async engine: every request handler and background task.
+async_engine = create_async_engine(_async_url(_url), pool_pre_ping=True,
+                                   **_pool_options(_url, timed_pool(AsyncAdaptedQueuePool, "async")))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+def reset_after_fork() -> None:
+    # Pooled connections inherited from the parent belong to it: forget them without closing its sockets.
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
 def get_db():
     db: Session = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
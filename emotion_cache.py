@@ -0,0 +1,64 @@
+# Imports
+from cache import TTLCache
+from emotion_service import EmotionResult
+
+import os, hashlib, threading
+
+# -----------------------------------------------------------------------------
+# -- Emotion Result Cache
+#
+# Retried and resubmitted selfies skip inference. Exact repeats are matched on a
+# SHA-256 of the upload before it is even decoded; re-encoded or re-cropped
+# copies of a user's recent selfies are matched on a 64-bit difference hash of
+# the preprocessed image.
+# -----------------------------------------------------------------------------
+
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "4096"))
+EMOTION_CACHE_TTL_SEC = int(os.getenv("EMOTION_CACHE_TTL_SEC", "86400"))
+EMOTION_CACHE_MAX_DISTANCE = int(os.getenv("EMOTION_CACHE_MAX_DISTANCE", "4"))   # Hamming bits; 0 disables
+RECENT_PER_USER = 16
+
+class EmotionCache:
+    def __init__(self, maxsize: int = EMOTION_CACHE_SIZE, ttl: float = EMOTION_CACHE_TTL_SEC,
+                 max_distance: int = EMOTION_CACHE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._exact = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Near-duplicates are only matched against the same user's recent selfies: a small
+        # per-user list keeps the scan to a handful of XORs and never crosses users.
+        self._recent = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._recent_lock = threading.Lock()
+        self.similar_hits = 0
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get_exact(self, digest: str) -> EmotionResult | None:
+        return self._exact.get(digest)
+
+    def get_similar(self, user_id: int, dhash: int) -> EmotionResult | None:
+        if self.max_distance <= 0:
+            return None
+
+        for other, result in self._recent.get(user_id, ()):
+            if (dhash ^ other).bit_count() <= self.max_distance:
+                self.similar_hits += 1
+                return result
+
+        return None
+
+    def put(self, digest: str, user_id: int, dhash: int | None, result: EmotionResult) -> None:
+        self._exact.set(digest, result)
+        if dhash is None or self.max_distance <= 0:
+            return
+
+        with self._recent_lock:
+            recent = [(dhash, result), *self._recent.get(user_id, ())][:RECENT_PER_USER]
+            self._recent.set(user_id, recent)
+
+    def stats(self) -> dict:
+        exact = self._exact.stats()
+
+        return {**exact, "similar_hits": self.similar_hits, "max_distance": self.max_distance}
+
+emotion_cache = EmotionCache()
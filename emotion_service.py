@@ -0,0 +1,187 @@
+# Imports
+from dataclasses import dataclass
+
+import os, threading, time
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# -- Emotion Service
+#
+# Two interchangeable backends behind the same batch interface, picked with
+# EMOTION_BACKEND:
+#   deepface  DeepFace's Keras emotion CNN on TensorFlow (default)
+#   onnx      the same CNN exported to ONNX (see onnx_export.py), optionally
+#             int8-quantized, run on ONNX Runtime with OpenCV's Haar face detector
+# -----------------------------------------------------------------------------
+
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "deepface")
+EMOTION_ONNX_PATH = os.getenv("EMOTION_ONNX_PATH", "models/emotion.onnx")
+EMOTION_ONNX_THREADS = int(os.getenv("EMOTION_ONNX_THREADS", "0"))     # 0 = ONNX Runtime default
+DETECTOR_BACKEND = "opencv"
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+@dataclass
+class EmotionResult:
+    mood: str
+    confidence: float | None
+    inference_ms: float
+
+# cv2 / DeepFace / TensorFlow / ONNX Runtime are imported inside the functions that need them so
+# that importing this module (and therefore main.py) stays cheap for workers that never see a selfie.
+
+def emotion_input(face: np.ndarray) -> np.ndarray:
+    import cv2
+
+    # DeepFace's preprocessing for the emotion CNN: face scaled into [0, 1], fitted and zero-padded
+    # to 224x224, then converted to the 48x48 grayscale input. Both backends share it so their
+    # outputs stay comparable.
+    if face.dtype == np.uint8:
+        face = face.astype(np.float32) / 255.0
+
+    h, w = face.shape[:2]
+    factor = min(224 / h, 224 / w)
+    resized = cv2.resize(face, (max(1, int(w * factor)), max(1, int(h * factor))))
+    dh, dw = 224 - resized.shape[0], 224 - resized.shape[1]
+    padded = np.pad(resized, ((dh // 2, dh - dh // 2), (dw // 2, dw - dw // 2), (0, 0)), "constant")
+
+    gray = cv2.cvtColor(padded.astype(np.float32), cv2.COLOR_BGR2GRAY)
+
+    return cv2.resize(gray, (48, 48))
+
+def haar_face_detector():
+    import cv2
+
+    return cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+
+def crop_largest_face(img: np.ndarray, detector) -> np.ndarray:
+    import cv2
+
+    # Same cascade and parameters as DeepFace's opencv detector, minus eye alignment. With no
+    # face found the whole frame is used, like enforce_detection=False.
+    faces = detector.detectMultiScale(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), 1.1, 10)
+    if not len(faces):
+        return img
+
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+
+    return img[y:y + h, x:x + w]
+
+class EmotionBackend:
+    name = "base"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def load(self) -> None:
+        with self._lock:
+            if self._ready:
+                return
+
+            self._load()
+            # Throwaway pass so the runtime builds its graph before the first real selfie does.
+            self._predict([np.zeros((224, 224, 3), dtype=np.uint8)])
+            self._ready = True
+
+    def _load(self) -> None:
+        raise NotImplementedError
+
+    def _predict(self, imgs: list[np.ndarray]) -> np.ndarray:
+        raise NotImplementedError
+
+    def analyze_batch(self, imgs: list[np.ndarray]) -> list[EmotionResult]:
+        self.load()
+
+        start = time.perf_counter()
+        predictions = self._predict(imgs)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        results = []
+        for pred in predictions:
+            scores = 100 * pred / pred.sum()
+            idx = int(np.argmax(scores))
+            results.append(EmotionResult(mood=EMOTION_LABELS[idx], confidence=float(scores[idx]), inference_ms=elapsed_ms))
+
+        return results
+
+    def analyze(self, img: np.ndarray) -> EmotionResult:
+        return self.analyze_batch([img])[0]
+
+class DeepFaceBackend(EmotionBackend):
+    name = "deepface"
+
+    def __init__(self, detector_backend: str = DETECTOR_BACKEND):
+        super().__init__()
+        self.detector_backend = detector_backend
+        self._model = None
+
+    def _load(self) -> None:
+        os.environ["DEEPFACE_BACKEND"] = self.detector_backend
+        from deepface.modules import modeling
+
+        self._model = modeling.build_model(task="facial_attribute", model_name="Emotion").model
+        modeling.build_model(task="face_detector", model_name=self.detector_backend)
+
+    def _face_tensor(self, img: np.ndarray) -> np.ndarray:
+        from deepface.modules import detection
+
+        # Same as DeepFace.analyze: first detected face (aligned), converted back to BGR.
+        faces = detection.extract_faces(
+            img_path=img, detector_backend=self.detector_backend, enforce_detection=False, align=True
+        )
+
+        return emotion_input(faces[0]["face"][:, :, ::-1])
+
+    def _predict(self, imgs: list[np.ndarray]) -> np.ndarray:
+        batch = np.stack([self._face_tensor(img) for img in imgs])[..., np.newaxis]
+
+        return self._model.predict(batch, verbose=0)
+
+class OnnxBackend(EmotionBackend):
+    name = "onnx"
+
+    def __init__(self, model_path: str = EMOTION_ONNX_PATH, threads: int = EMOTION_ONNX_THREADS):
+        super().__init__()
+        self.model_path = model_path
+        self.threads = threads
+        self._session = None
+        self._input_name = None
+        self._detector = None
+
+    def _load(self) -> None:
+        import onnxruntime as ort
+
+        if not os.path.exists(self.model_path):
+            raise RuntimeError(f"ONNX emotion model not found at {self.model_path}; run onnx_export.py first.")
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            opts.intra_op_num_threads = self.threads
+
+        self._session = ort.InferenceSession(self.model_path, opts, providers=["CPUExecutionProvider"])
+        self._input_name = self._session.get_inputs()[0].name
+        self._detector = haar_face_detector()
+
+    def _predict(self, imgs: list[np.ndarray]) -> np.ndarray:
+        faces = [emotion_input(crop_largest_face(img, self._detector)) for img in imgs]
+        batch = np.stack(faces)[..., np.newaxis].astype(np.float32)
+
+        return self._session.run(None, {self._input_name: batch})[0]
+
+BACKENDS: dict[str, type[EmotionBackend]] = {
+    DeepFaceBackend.name: DeepFaceBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+def create_backend(name: str = EMOTION_BACKEND) -> EmotionBackend:
+    if name not in BACKENDS:
+        raise RuntimeError(f"Unknown EMOTION_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+
+    return BACKENDS[name]()
+
+emotion_service = create_backend()
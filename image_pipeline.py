@@ -0,0 +1,188 @@
+# Imports
+from dataclasses import dataclass
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from metrics import observe_selfie_rejected
+
+import os, struct
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# -- Selfie Image Pipeline
+#
+# Everything between the upload and the detector: a body-size guard enforced
+# while the request streams in, a magic-byte check, a reduced-resolution decode
+# and a downscale to the detector's working size. Images that can't produce a
+# useful face are rejected here, before they take a slot in the inference queue.
+# -----------------------------------------------------------------------------
+
+SELFIE_MAX_BYTES = int(os.getenv("SELFIE_MAX_BYTES", str(12 * 1024 * 1024)))
+SELFIE_MAX_DIM = int(os.getenv("SELFIE_MAX_DIM", "640"))        # longest side handed to the detector
+SELFIE_MIN_DIM = int(os.getenv("SELFIE_MIN_DIM", "96"))         # shortest side worth looking for a face in
+SELFIE_MAX_PIXELS = int(os.getenv("SELFIE_MAX_PIXELS", str(50_000_000)))
+
+class ImageRejected(Exception):
+    status_code = 422
+    reason = "unusable"
+
+class UploadTooLarge(ImageRejected):
+    status_code = 413
+    reason = "too_large"
+
+class UnsupportedImage(ImageRejected):
+    status_code = 415
+    reason = "unsupported"
+
+@dataclass
+class PreparedImage:
+    image: np.ndarray
+    format: str
+    original_size: tuple[int, int]      # (width, height)
+    processed_size: tuple[int, int]
+    dhash: int
+
+# -- Upload guard
+
+class UploadLimitMiddleware:
+    # Counts body bytes as they arrive, so an oversized upload is cut off at the limit instead of
+    # being spooled to disk by the multipart parser first.
+    def __init__(self, app, paths: tuple[str, ...], max_bytes: int = SELFIE_MAX_BYTES):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            observe_selfie_rejected(UploadTooLarge.reason)
+            response = JSONResponse({"detail": "Upload too large."}, status_code=413, headers={"Connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # HTTPException passes through FastAPI's body parsing and becomes a plain 413.
+                    observe_selfie_rejected(UploadTooLarge.reason)
+                    raise HTTPException(status_code=413, detail="Upload too large.")
+
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# -- Header sniffing
+
+def sniff_format(data: bytes) -> str:
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+
+    raise UnsupportedImage("Only JPEG, PNG and WebP selfies are supported.")
+
+def _jpeg_size(data: bytes) -> tuple[int, int] | None:
+    # Walk the marker segments up to the first SOFn frame header.
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+
+    return None
+
+def _webp_size(data: bytes) -> tuple[int, int] | None:
+    # The first chunk after the RIFF header describes the canvas.
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30 and data[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+
+    return None
+
+def header_size(data: bytes, fmt: str) -> tuple[int, int] | None:
+    if fmt == "jpeg":
+        return _jpeg_size(data)
+    if fmt == "png" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if fmt == "webp":
+        return _webp_size(data)
+
+    return None
+
+# -- Decode + downscale
+
+def _reduced_flag(size: tuple[int, int], fmt: str) -> int:
+    import cv2
+
+    # libjpeg can decode at 1/2, 1/4 or 1/8 scale for a fraction of the cost of a full decode.
+    if fmt != "jpeg":
+        return cv2.IMREAD_COLOR
+
+    longest = max(size)
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest / factor >= SELFIE_MAX_DIM:
+            return flag
+
+    return cv2.IMREAD_COLOR
+
+def dhash(img: np.ndarray) -> int:
+    import cv2
+
+    # 64-bit difference hash: survives re-encoding, resizing and small crops of the same photo.
+    small = cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), "big")
+
+def prepare_selfie(data: bytes) -> PreparedImage:
+    import cv2
+
+    if not data:
+        raise ImageRejected("Empty upload.")
+
+    fmt = sniff_format(data)
+    size = header_size(data, fmt)
+    # Never decode an image whose resolution hasn't been checked against the cap.
+    if size is None:
+        raise UnsupportedImage("Could not read image dimensions.")
+    if size[0] * size[1] > SELFIE_MAX_PIXELS:
+        raise ImageRejected("Image resolution is too large.")
+    if min(size) < SELFIE_MIN_DIM:
+        raise ImageRejected("Image is too small to find a face in.")
+
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), _reduced_flag(size, fmt))
+    if img is None:
+        raise UnsupportedImage("Could not decode image.")
+
+    h, w = img.shape[:2]
+    scale = SELFIE_MAX_DIM / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+    # Blank, black or blown-out frames (lens cap, pocket shots) never contain a usable face.
+    if float(img.std()) < 4.0:
+        raise ImageRejected("Image has no usable detail.")
+
+    return PreparedImage(
+        image=img, format=fmt, original_size=size, processed_size=(img.shape[1], img.shape[0]), dhash=dhash(img)
+    )
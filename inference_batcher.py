@@ -0,0 +1,247 @@
+# Imports
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+import os, queue, threading, time
+import multiprocessing as mp
+import numpy as np
+
+from emotion_service import EmotionResult, emotion_service
+
+# -----------------------------------------------------------------------------
+# -- Inference Batcher
+# -----------------------------------------------------------------------------
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+MAX_QUEUE_SIZE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))     # 0 = run inference in the API process
+RETRY_AFTER_SEC = int(os.getenv("INFERENCE_RETRY_AFTER", "2"))
+INFERENCE_TIMEOUT_SEC = float(os.getenv("INFERENCE_TIMEOUT_SEC", "30"))
+WARMUP_ON_STARTUP = os.getenv("EMOTION_WARMUP", "1") == "1"
+
+class InferenceQueueFull(Exception):
+    pass
+
+# Worker-process side: each worker loads the model once in its initializer.
+def _init_worker() -> None:
+    emotion_service.load()
+
+def _warm_worker() -> bool:
+    return emotion_service.ready
+
+def _analyze_in_worker(imgs: list[np.ndarray]) -> list[EmotionResult]:
+    return emotion_service.analyze_batch(imgs)
+
+@dataclass
+class _Pending:
+    image: np.ndarray
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+class InferenceBatcher:
+    def __init__(self, workers: int = WORKERS, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS, max_queue_size: int = MAX_QUEUE_SIZE):
+        self.workers = max(0, workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue[_Pending | None] = queue.Queue(maxsize=max(1, max_queue_size))
+        self._thread: threading.Thread | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        # One batch in flight per worker; everything else waits in the bounded queue.
+        self._slots = threading.BoundedSemaphore(max(1, self.workers))
+        self._start_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._broken: ProcessPoolExecutor | None = None
+        self._ready = False
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._in_flight = 0
+        self._batch_sizes: Counter[int] = Counter()
+        self._queue_waits_ms: deque[float] = deque(maxlen=1024)
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+
+            if self.workers:
+                with self._pool_lock:
+                    self._pool = self._new_pool()
+
+            self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn, not fork: TensorFlow's thread pools don't survive a fork.
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"), initializer=_init_worker)
+
+    def _replace_broken_pool(self) -> ProcessPoolExecutor | None:
+        # A worker died (OOM kill, failing initializer) and the executor refuses all further work.
+        # Runs on the batcher thread: the executor's own thread reports the failure and can't shut it down.
+        with self._pool_lock:
+            if self._pool is not None and self._pool is self._broken:
+                print("Inference worker pool broke; starting a new one.")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+                self._restarts += 1
+
+            return self._pool
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def warm_up(self) -> None:
+        self.start()
+        if not self._pool:
+            emotion_service.load()
+        else:
+            for f in [self._pool.submit(_warm_worker) for _ in range(self.workers)]:
+                f.result()
+
+        self._ready = True
+
+    def stop(self) -> None:
+        with self._start_lock:
+            if not self._thread:
+                return
+
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+            with self._pool_lock:
+                pool, self._pool = self._pool, None
+            if pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, image: np.ndarray) -> Future:
+        # Images arrive decoded and downscaled (image_pipeline), so workers get a small array
+        # instead of a multi-megabyte upload to decode.
+        self.start()
+        pending = _Pending(image=image)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise InferenceQueueFull()
+
+        return pending.future
+
+    def _collect(self, first: _Pending) -> tuple[list[_Pending], bool]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item is None:
+                return self._live(batch), True
+
+            batch.append(item)
+
+        return self._live(batch), False
+
+    @staticmethod
+    def _live(batch: list[_Pending]) -> list[_Pending]:
+        # Requests that timed out or disconnected while queued have cancelled their futures.
+        return [p for p in batch if p.future.set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch, stopping = self._collect(first)
+            if not batch:
+                continue
+            self._slots.acquire()
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list[_Pending]) -> None:
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._batches += 1
+            self._images += len(batch)
+            self._in_flight += 1
+            self._batch_sizes[len(batch)] += 1
+            self._queue_waits_ms.extend((started - p.enqueued_at) * 1000 for p in batch)
+
+        imgs = [p.image for p in batch]
+        pool = self._replace_broken_pool()
+        if pool:
+            try:
+                f = pool.submit(_analyze_in_worker, imgs)
+            except Exception as e:
+                # Never let a refused submit kill this thread or keep the slot.
+                f = Future()
+                f.set_exception(e)
+            f.add_done_callback(lambda done: self._resolve(batch, done, pool))
+            return
+
+        f = Future()
+        try:
+            f.set_result(emotion_service.analyze_batch(imgs))
+        except Exception as e:
+            f.set_exception(e)
+        self._resolve(batch, f)
+
+    def _resolve(self, batch: list[_Pending], done: Future, pool: ProcessPoolExecutor | None = None) -> None:
+        with self._stats_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+        if isinstance(done.exception(), BrokenProcessPool):
+            self._broken = pool
+
+        if done.exception() is not None:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(done.exception())
+            return
+
+        self._ready = True
+        for p, result in zip(batch, done.result()):
+            if not p.future.done():
+                p.future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            waits = np.array(self._queue_waits_ms) if self._queue_waits_ms else np.zeros(1)
+
+            return {
+                "ready": self._ready,
+                "backend": emotion_service.name,
+                "workers": self.workers,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_queue_size": self._queue.maxsize,
+                "queue_depth": self._queue.qsize(),
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+                "pool_restarts": self._restarts,
+                "batches": self._batches,
+                "images": self._images,
+                "avg_batch_size": round(self._images / self._batches, 2) if self._batches else 0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "queue_wait_ms": {
+                    "avg": round(float(waits.mean()), 2),
+                    "p95": round(float(np.percentile(waits, 95)), 2),
+                    "max": round(float(waits.max()), 2),
+                },
+            }
+
+inference_batcher = InferenceBatcher()
@@ -0,0 +1,192 @@
+# Imports
+from sqlalchemy import Select, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from models import MoodEntry, Track, TrackLog
+
+import os, threading
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# -- Mood Insights
+#
+# One query pulls a user's whole mood history (with the artist playing, if any)
+# into a DataFrame. Everything after that is column arithmetic: rolling mood
+# shares, a mood-to-mood transition matrix, hour / weekday patterns and which
+# artists show up more often than usual with each mood.
+#
+# Results are memoized per user. A user's generation is bumped whenever one of
+# their mood entries or track logs commits, which retires every cached result
+# for them; the TTL bounds staleness for writes made by other processes.
+# -----------------------------------------------------------------------------
+
+INSIGHTS_CACHE_SIZE = int(os.getenv("INSIGHTS_CACHE_SIZE", "2000"))
+INSIGHTS_CACHE_TTL_SEC = int(os.getenv("INSIGHTS_CACHE_TTL_SEC", "600"))
+TRANSITION_MAX_GAP_HOURS = float(os.getenv("INSIGHTS_TRANSITION_MAX_GAP_HOURS", "24"))
+ARTIST_MIN_PLAYS = 3
+TOP_ARTISTS = 5
+
+COLUMNS = ["created_at", "mood", "artist"]
+
+def history_frame_query(user_id: int) -> Select:
+    return (
+        select(MoodEntry.created_at, MoodEntry.detected_mood, Track.artist_name)
+        .outerjoin(TrackLog, TrackLog.mood_id == MoodEntry.id)
+        .outerjoin(Track, Track.id == TrackLog.track_id)
+        .where(MoodEntry.user_id == user_id, MoodEntry.created_at.is_not(None))
+        .order_by(MoodEntry.created_at, MoodEntry.id)
+    )
+
+def history_frame(rows, tz: str = "UTC") -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    # Stored timestamps are UTC; some drivers hand them back naive.
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True).dt.tz_convert(tz)
+    df["mood"] = df["mood"].astype("category")
+
+    return df
+
+def _rolling_shares(df: pd.DataFrame, moods: list[str], window: int, days: int) -> dict:
+    # Local calendar days; dropping the zone first keeps DST changes out of the day boundaries.
+    day = df["created_at"].dt.tz_localize(None).dt.floor("D")
+    today = pd.Timestamp.now(tz=df["created_at"].dt.tz).tz_localize(None).floor("D")
+    # Always the last `days` days up to today, plus the window before them for the first sums;
+    # crosstab over all history is most of the cost.
+    span = pd.date_range(end=today, periods=days + window - 1, freq="D")
+    recent = day >= span[0]
+    daily = (
+        pd.crosstab(day[recent], df["mood"][recent])
+        .reindex(index=span, columns=moods, fill_value=0)
+    )
+    rolled = daily.rolling(window, min_periods=1).sum().iloc[-days:]
+    shares = rolled.div(rolled.sum(axis=1).replace(0, np.nan), axis=0).fillna(0).round(4)
+
+    return {
+        "window_days": window,
+        "days": [d.date().isoformat() for d in shares.index],
+        "shares": {m: shares[m].tolist() for m in moods},
+    }
+
+def _transitions(df: pd.DataFrame, moods: list[str]) -> dict:
+    k = len(moods)
+    codes = df["mood"].cat.codes.to_numpy().astype(np.int64)
+    gaps = df["created_at"].diff().dt.total_seconds().to_numpy()[1:]
+    # Only consecutive check-ins close enough together count as one mood following another.
+    keep = gaps <= TRANSITION_MAX_GAP_HOURS * 3600
+    counts = np.bincount(codes[:-1][keep] * k + codes[1:][keep], minlength=k * k).reshape(k, k)
+    totals = counts.sum(axis=1, keepdims=True)
+    probs = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+    return {
+        "max_gap_hours": TRANSITION_MAX_GAP_HOURS,
+        "counts": {m: dict(zip(moods, counts[i].tolist())) for i, m in enumerate(moods)},
+        "probabilities": {m: dict(zip(moods, probs[i].round(4).tolist())) for i, m in enumerate(moods)},
+    }
+
+def _by_period(df: pd.DataFrame, moods: list[str], period: np.ndarray, size: int) -> dict:
+    k = len(moods)
+    codes = df["mood"].cat.codes.to_numpy().astype(np.int64)
+    counts = np.bincount(period.astype(np.int64) * k + codes, minlength=size * k).reshape(size, k)
+
+    return {m: counts[:, i].tolist() for i, m in enumerate(moods)}
+
+def _artists(df: pd.DataFrame) -> dict:
+    played = df.dropna(subset=["artist"])
+    if played.empty:
+        return {}
+
+    table = pd.crosstab(played["mood"].astype(str), played["artist"])
+    table = table.loc[:, table.sum(axis=0) >= ARTIST_MIN_PLAYS]
+    table = table.loc[table.sum(axis=1) > 0]
+    if table.empty:
+        return {}
+
+    # Lift: how much more often an artist plays with this mood than across all moods.
+    counts = table.to_numpy(dtype=np.float64)
+    total = counts.sum()
+    lift = (counts / counts.sum(axis=1, keepdims=True)) / (counts.sum(axis=0, keepdims=True) / total)
+    order = np.argsort(-lift, axis=1)[:, :TOP_ARTISTS]
+
+    artists = table.columns.to_numpy()
+    result = {}
+    for i, mood in enumerate(table.index):
+        top = [
+            {"artist": str(artists[j]), "plays": int(counts[i, j]), "lift": round(float(lift[i, j]), 3)}
+            for j in order[i] if counts[i, j] > 0
+        ]
+        if top:
+            result[str(mood)] = top
+
+    return result
+
+def compute_insights(df: pd.DataFrame, window: int = 7, days: int = 90) -> dict:
+    if df.empty:
+        return {"total_entries": 0, "moods": [], "rolling": None, "transitions": None,
+                "hour_of_day": {}, "weekday": {}, "artists": {}}
+
+    df["mood"] = df["mood"].cat.remove_unused_categories()
+    moods = [str(m) for m in df["mood"].cat.categories]
+
+    return {
+        "total_entries": len(df),
+        "first_entry": df["created_at"].iloc[0].isoformat(),
+        "last_entry": df["created_at"].iloc[-1].isoformat(),
+        "moods": moods,
+        "rolling": _rolling_shares(df, moods, window, days),
+        "transitions": _transitions(df, moods),
+        "hour_of_day": _by_period(df, moods, df["created_at"].dt.hour.to_numpy(), 24),
+        "weekday": _by_period(df, moods, df["created_at"].dt.weekday.to_numpy(), 7),
+        "artists": _artists(df),
+    }
+
+def insights_from_rows(rows, tz: str = "UTC", window: int = 7, days: int = 90) -> dict:
+    return compute_insights(history_frame(rows, tz), window, days)
+
+# -- Memoization
+
+class InsightsCache:
+    def __init__(self, maxsize: int = INSIGHTS_CACHE_SIZE, ttl: float = INSIGHTS_CACHE_TTL_SEC):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def get(self, user_id: int, params: tuple) -> dict | None:
+        return self._cache.get((user_id, self.generation(user_id), params))
+
+    def put(self, user_id: int, generation: int, params: tuple, result: dict) -> None:
+        # Keyed by the generation read before the query, so a result computed while a new entry
+        # was committing is never served after it.
+        self._cache.set((user_id, generation, params), result)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+insights_cache = InsightsCache()
+
+def invalidate_after_commit(db: AsyncSession, user_id: int) -> None:
+    # For writers that bypass the ORM unit of work (bulk Core inserts).
+    db.sync_session.info.setdefault("insights_users", set()).add(user_id)
+
+@event.listens_for(Session, "after_flush")
+def _collect_users(session: Session, flush_context) -> None:
+    users = {o.user_id for o in session.new if isinstance(o, (MoodEntry, TrackLog))}
+    if users:
+        session.info.setdefault("insights_users", set()).update(users)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users(session: Session) -> None:
+    for user_id in session.info.pop("insights_users", ()):
+        insights_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_users(session: Session) -> None:
+    session.info.pop("insights_users", None)
@@ -0,0 +1,144 @@
+# Imports
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from sqlalchemy import event, select, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import Job, utcnow
+
+import os, asyncio, random, traceback
+
+# -----------------------------------------------------------------------------
+# -- Background Jobs
+#
+# Durable, DB-backed queue for side effects that shouldn't hold up a response.
+# Jobs are inserted in the same transaction as the row that caused them, then
+# claimed by worker tasks with SELECT ... FOR UPDATE SKIP LOCKED, so several
+# API processes can share the table.
+# -----------------------------------------------------------------------------
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL_SEC = float(os.getenv("JOB_POLL_INTERVAL_SEC", "2"))
+JOB_BACKOFF_BASE_SEC = float(os.getenv("JOB_BACKOFF_BASE_SEC", "2"))
+JOB_LEASE_SEC = int(os.getenv("JOB_LEASE_SEC", "300"))     # running jobs older than this are reclaimed
+
+JobHandler = Callable[[AsyncSession, Job], Awaitable[dict | None]]
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+class PermanentJobError(Exception):
+    # Raised by handlers for failures a retry can't fix; the job fails without using up its attempts.
+    pass
+
+def job_handler(kind: str):
+    def register(fn: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+def _now() -> datetime:
+    return utcnow()
+
+async def enqueue(db: AsyncSession, kind: str, payload: dict, user_id: int | None = None, max_attempts: int = 5) -> Job:
+    job = Job(kind=kind, payload=payload, user_id=user_id, max_attempts=max_attempts)
+    db.add(job); await db.flush()
+
+    # Wake a worker as soon as the caller's transaction commits instead of waiting for the next poll.
+    event.listen(db.sync_session, "after_commit", lambda _: job_worker.notify(), once=True)
+
+    return job
+
+class JobWorker:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+
+        self._tasks = [asyncio.create_task(self._loop(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                worked = await self.run_once()
+            except Exception as e:
+                print("Job worker error:", e)
+                worked = False
+
+            if not worked:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), JOB_POLL_INTERVAL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def _claim(self, db: AsyncSession) -> Job | None:
+        now = _now()
+        job = (await db.execute(
+            select(Job)
+            .where(or_(
+                and_(Job.status.in_(("queued", "retry")), Job.run_after <= now),
+                and_(Job.status == "running", Job.updated_at < now - timedelta(seconds=JOB_LEASE_SEC)),
+            ))
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).scalars().first()
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.attempts += 1
+        await db.commit()
+
+        return job
+
+    async def run_once(self) -> bool:
+        async with AsyncSessionLocal() as db:
+            job = await self._claim(db)
+            if job is None:
+                return False
+
+            job_id = job.id
+            try:
+                handler = JOB_HANDLERS[job.kind]
+                result = await handler(db, job)
+            except Exception as e:
+                await db.rollback()
+                await self._fail(db, job_id, e)
+                return True
+
+            job = await db.get(Job, job_id)
+            job.status = "done"
+            job.result = result
+            job.last_error = None
+            await db.commit()
+
+            return True
+
+    async def _fail(self, db: AsyncSession, job_id: int, error: Exception) -> None:
+        job = await db.get(Job, job_id)
+        job.last_error = "".join(traceback.format_exception_only(type(error), error)).strip()[:1000]
+        if isinstance(error, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = "failed"
+        else:
+            delay = JOB_BACKOFF_BASE_SEC * 2 ** (job.attempts - 1) + random.uniform(0, JOB_BACKOFF_BASE_SEC)
+            # Errors that know when to come back (Spotify Retry-After, breaker cooldown) push the retry out.
+            delay = max(delay, getattr(error, "retry_after", None) or 0)
+            job.status = "retry"
+            job.run_after = _now() + timedelta(seconds=delay)
+        await db.commit()
+
+job_worker = JobWorker()
@@ -0,0 +1,115 @@
+# Imports
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import asyncio, json, os
+
+# -----------------------------------------------------------------------------
+# -- Live Events
+#
+# In-process fan-out of a user's new mood entries, logged tracks, playlists and
+# the matching stats deltas to their open /mood/events streams. Events are
+# published only once the transaction that wrote them commits. Each connection
+# gets a bounded queue; a client that falls behind is told to resync instead
+# of holding the writer up.
+#
+# Only connections served by the process that did the write see an event.
+# -----------------------------------------------------------------------------
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+LIVE_MAX_PER_USER = int(os.getenv("LIVE_MAX_PER_USER", "5"))
+LIVE_HEARTBEAT_SEC = float(os.getenv("LIVE_HEARTBEAT_SEC", "15"))
+
+RESYNC = {"event": "resync", "data": {}}
+
+class TooManySubscribers(Exception):
+    pass
+
+def sse(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+class EventHub:
+    def __init__(self, queue_size: int = LIVE_QUEUE_SIZE, max_per_user: int = LIVE_MAX_PER_USER):
+        self.queue_size = queue_size
+        self.max_per_user = max_per_user
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        self._published = 0
+        self._resyncs = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        if len(self._subscribers[user_id]) >= self.max_per_user:
+            raise TooManySubscribers()
+
+        q = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(q)
+
+        return q
+
+    def unsubscribe(self, user_id: int, q: asyncio.Queue) -> None:
+        subs = self._subscribers.get(user_id)
+        if subs is None:
+            return
+
+        subs.discard(q)
+        if not subs:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: int, name: str, data: dict) -> None:
+        for q in self._subscribers.get(user_id, ()):
+            self._published += 1
+            try:
+                q.put_nowait({"event": name, "data": data})
+            except asyncio.QueueFull:
+                # Whatever is buffered is stale now; drop it and have the client refetch.
+                self._resyncs += 1
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(RESYNC)
+
+    def publish_after_commit(self, db: AsyncSession, user_id: int, events: list[tuple[str, dict]]) -> None:
+        if user_id not in self._subscribers:
+            return
+
+        def _send(_):
+            for name, data in events:
+                self.publish(user_id, name, data)
+
+        event.listen(db.sync_session, "after_commit", _send, once=True)
+
+    async def stream(self, user_id: int, q: asyncio.Queue, heartbeat: float = LIVE_HEARTBEAT_SEC):
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(q.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection.
+                    yield ": ping\n\n"
+                    continue
+
+                yield sse(item["event"], item["data"])
+        finally:
+            self.unsubscribe(user_id, q)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "published": self._published,
+            "resyncs": self._resyncs,
+        }
+
+live_events = EventHub()
+
+# -- Event payloads
+
+def mood_events(entries: list[dict]) -> list[tuple[str, dict]]:
+    moods: dict[str, int] = defaultdict(int)
+    for e in entries:
+        moods[e["detected_mood"]] += 1
+
+    return [("mood", e) for e in entries] + [("stats", {"moods": dict(moods), "tracks": 0})]
+
+def track_events(track: dict) -> list[tuple[str, dict]]:
+    return [("track", track), ("stats", {"moods": {}, "tracks": 1})]
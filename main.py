@@ -1,17 +1,56 @@
 # Imports
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, engine
 from auth_routes import router as auth_router
 from mood_routes import router as mood_router
 from spotify_routes import router as spotify_router
+from inference_batcher import inference_batcher, WARMUP_ON_STARTUP
+from spotify_client import spotify
+from database import async_engine
+from token_manager import token_manager
+from jobs import job_worker
+from live_events import live_events
+from image_pipeline import UploadLimitMiddleware
+from metrics import MetricsMiddleware, instrument_inference, instrument_live, instrument_spotify, instrument_threadpool, render
+
+import asyncio
+import rollups  # noqa: F401 -- registers the after_flush hook that keeps the rollup tables current
 
 # ----------------------------------------------------------------------------------
 # -- Main
 # ----------------------------------------------------------------------------------
-Base.metadata.create_all(bind=engine)
+# Schema is managed by Alembic (`alembic upgrade head`), not created on boot.
+
+async def _warm_up_inference():
+    try:
+        await run_in_threadpool(inference_batcher.warm_up)
+    except Exception as e:
+        print("Emotion model warm-up failed:", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the emotion model in the background so the app accepts requests right away;
+    # with EMOTION_WARMUP=0 it loads on the first selfie instead.
+    warmup = asyncio.create_task(_warm_up_inference()) if WARMUP_ON_STARTUP else None
+    instrument_threadpool()
+    instrument_inference(inference_batcher.stats)
+    instrument_spotify(spotify.stats)
+    instrument_live(live_events.stats)
+    token_manager.start()
+    job_worker.start()
+    yield
+    await job_worker.stop()
+    await token_manager.stop()
+    if warmup:
+        warmup.cancel()
+    await run_in_threadpool(inference_batcher.stop)
+    await spotify.aclose()
+    await async_engine.dispose()
 
-app = FastAPI(title="Synaptic Sound Backend", version="1.0.0")
+app = FastAPI(title="Synaptic Sound Backend", version="1.0.0", lifespan=lifespan)
 
 ALLOWED_ORIGINS = [
     "https://synaptic-sound.com",
@@ -26,7 +65,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
+app.add_middleware(UploadLimitMiddleware, paths=("/mood/selfie",))
+app.add_middleware(MetricsMiddleware)
 
 # Routers
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
@@ -41,3 +83,15 @@ def root():
 def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render()
+
+    return Response(body, media_type=content_type)
+
+@app.get("/.well-known/ready")
+def ready():
+    model_ready = inference_batcher.ready
+    body = {"status": "ready" if model_ready else "loading", "model_ready": model_ready}
+
+    return JSONResponse(body, status_code=200 if model_ready else 503)
@@ -0,0 +1,225 @@
+# Imports
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from starlette.datastructures import MutableHeaders
+
+import os, time
+import anyio.to_thread
+
+# -----------------------------------------------------------------------------
+# -- Metrics
+#
+# Prometheus histograms for request, DB, Spotify and inference latency, served
+# from /metrics. With SERVER_TIMING=1 each response also carries a Server-Timing
+# header breaking its own duration down the same way.
+# -----------------------------------------------------------------------------
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "0") == "1"
+
+FAST_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request duration by route template.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+)
+SPOTIFY_REQUEST_DURATION = Histogram(
+    "spotify_request_duration_seconds", "Outbound Spotify call duration.", ["endpoint", "status"]
+)
+SPOTIFY_RETRIES = Counter("spotify_retries_total", "Retried Spotify calls.", ["endpoint", "reason"])
+SPOTIFY_SHORT_CIRCUITS = Counter(
+    "spotify_short_circuits_total", "Spotify calls skipped by the breaker or an active rate limit.", ["endpoint"]
+)
+SPOTIFY_BREAKER_OPEN = Gauge("spotify_breaker_open", "1 while the Spotify circuit breaker is open or half-open.")
+SPOTIFY_LIMITER_TOKENS = Gauge("spotify_limiter_tokens", "Tokens left in the Spotify rate limiter.")
+SPOTIFY_LIMITER_BLOCKED = Gauge("spotify_limiter_blocked_seconds", "Remaining Retry-After pause.")
+INFERENCE_DURATION = Histogram(
+    "inference_duration_seconds", "Selfie inference duration; total includes batching and queueing.", ["stage"]
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "SQL statement duration.", ["engine", "operation"], buckets=FAST_BUCKETS
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection.", ["engine"], buckets=FAST_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "DB connections currently checked out.", ["engine"])
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured DB pool size.", ["engine"])
+THREADPOOL_BUSY = Gauge("threadpool_busy_threads", "Threadpool tokens in use for sync handlers/dependencies.")
+THREADPOOL_SIZE = Gauge("threadpool_size", "Threadpool capacity for sync handlers/dependencies.")
+SELFIE_UPLOAD_BYTES = Histogram(
+    "selfie_upload_bytes", "Selfie upload size.", buckets=(64e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 12e6, 16e6)
+)
+SELFIE_IMAGE_PIXELS = Histogram(
+    "selfie_image_megapixels", "Selfie resolution before and after preprocessing.", ["stage"],
+    buckets=(.05, .1, .25, .5, 1, 2, 4, 8, 12, 16, 24, 48)
+)
+SELFIE_PREPROCESS_DURATION = Histogram(
+    "selfie_preprocess_duration_seconds", "Selfie validation, decode and downscale time.", buckets=FAST_BUCKETS
+)
+EMOTION_CACHE_LOOKUPS = Counter("emotion_cache_lookups_total", "Selfie result cache lookups.", ["result"])
+SELFIE_REJECTED = Counter("selfie_rejected_total", "Selfies rejected before inference.", ["reason"])
+INFERENCE_QUEUE_DEPTH = Gauge("inference_queue_depth", "Selfies waiting for an inference batch.")
+INFERENCE_IN_FLIGHT = Gauge("inference_in_flight_batches", "Inference batches currently running.")
+LIVE_CONNECTIONS = Gauge("live_event_connections", "Open /mood/events streams.")
+
+# -- Per-request timings (Server-Timing)
+
+@dataclass
+class _Timings:
+    spans: dict[str, float] = field(default_factory=dict)
+    db_statements: int = 0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        if self.db_statements:
+            parts.append(f'db-statements;desc="{self.db_statements}"')
+        parts.append(f"total;dur={total * 1000:.2f}")
+
+        return ", ".join(parts)
+
+_timings: ContextVar[_Timings | None] = ContextVar("request_timings", default=None)
+
+def _record(name: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+def observe_spotify(endpoint: str, status: str, seconds: float) -> None:
+    SPOTIFY_REQUEST_DURATION.labels(endpoint, status).observe(seconds)
+    _record("spotify", seconds)
+
+def observe_spotify_retry(endpoint: str, reason: str) -> None:
+    SPOTIFY_RETRIES.labels(endpoint, reason).inc()
+
+def observe_spotify_short_circuit(endpoint: str) -> None:
+    SPOTIFY_SHORT_CIRCUITS.labels(endpoint).inc()
+
+def observe_inference(total: float, model: float | None = None) -> None:
+    INFERENCE_DURATION.labels("total").observe(total)
+    if model is not None:
+        INFERENCE_DURATION.labels("model").observe(model)
+    _record("inference", total)
+
+def observe_selfie(upload_bytes: int, original_size: tuple[int, int], processed_size: tuple[int, int],
+                   seconds: float) -> None:
+    SELFIE_UPLOAD_BYTES.observe(upload_bytes)
+    SELFIE_IMAGE_PIXELS.labels("original").observe(original_size[0] * original_size[1] / 1e6)
+    SELFIE_IMAGE_PIXELS.labels("processed").observe(processed_size[0] * processed_size[1] / 1e6)
+    SELFIE_PREPROCESS_DURATION.observe(seconds)
+    _record("preprocess", seconds)
+
+def observe_emotion_cache(result: str) -> None:
+    EMOTION_CACHE_LOOKUPS.labels(result).inc()
+
+def observe_selfie_rejected(reason: str) -> None:
+    SELFIE_REJECTED.labels(reason).inc()
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware so streamed responses aren't buffered.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = _Timings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    MutableHeaders(scope=message).append("Server-Timing", timings.header(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            # The router stores the matched route in the scope; label by its template, not the raw path.
+            route = getattr(scope.get("route"), "path_format", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+            HTTP_REQUEST_DB_STATEMENTS.labels(route).observe(timings.db_statements)
+
+# -- Database
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[:1]
+    op = word[0].upper() if word else ""
+
+    return op if op in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_STATEMENT_DURATION.labels(name, _operation(statement)).observe(elapsed)
+
+        timings = _timings.get()
+        if timings is not None:
+            timings.add("db", elapsed)
+            timings.db_statements += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        if ctx.connection is not None and ctx.connection.info.get("query_start"):
+            ctx.connection.info["query_start"].pop()
+
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.pool.checkedout())
+        DB_POOL_SIZE.labels(name).set_function(lambda: engine.pool.size())
+
+def timed_pool(base: type[Pool], name: str) -> type[Pool]:
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_POOL_CHECKOUT_WAIT.labels(name).observe(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+
+    return TimedPool
+
+# -- Runtime
+
+def instrument_threadpool() -> None:
+    # Must run inside the event loop: the default limiter is per loop.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY.set_function(lambda: limiter.borrowed_tokens)
+    THREADPOOL_SIZE.set_function(lambda: limiter.total_tokens)
+
+def instrument_inference(stats: Callable[[], dict]) -> None:
+    INFERENCE_QUEUE_DEPTH.set_function(lambda: stats()["queue_depth"])
+    INFERENCE_IN_FLIGHT.set_function(lambda: stats()["in_flight"])
+
+def instrument_spotify(stats: Callable[[], dict]) -> None:
+    SPOTIFY_BREAKER_OPEN.set_function(lambda: float(stats()["breaker"]["state"] != "closed"))
+    SPOTIFY_LIMITER_TOKENS.set_function(lambda: stats()["limiter"]["tokens"])
+    SPOTIFY_LIMITER_BLOCKED.set_function(lambda: stats()["limiter"]["blocked_for_sec"])
+
+def instrument_live(stats: Callable[[], dict]) -> None:
+    LIVE_CONNECTIONS.set_function(lambda: stats()["connections"])
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,39 @@
+# Imports
+from logging.config import fileConfig
+from alembic import context
+from database import engine, Base
+
+import models  # noqa: F401 -- populates Base.metadata
+
+# -----------------------------------------------------------------------------
+# -- Alembic Environment
+# -----------------------------------------------------------------------------
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False), target_metadata=target_metadata, literal_binds=True,
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection, target_metadata=target_metadata,
+            # SQLite can't ALTER constraints in place; batch mode rebuilds the table instead.
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,83 @@
+"""Baseline schema (what Base.metadata.create_all used to build)
+
+Databases created by the old create_all-on-boot already have these tables; they are
+skipped, so `alembic upgrade head` brings those databases forward like any other.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("spotify_id", sa.String(), nullable=False, unique=True),
+            sa.Column("display_name", sa.String()),
+            sa.Column("access_token", sa.String()),
+            sa.Column("refresh_token_enc", sa.String()),
+            sa.Column("token_expires_at", sa.DateTime()),
+            sa.Column("auto_create_enabled", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if "mood_entries" not in existing:
+        op.create_table(
+            "mood_entries",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE")),
+            sa.Column("emoji", sa.String(), nullable=True),
+            sa.Column("image_url", sa.String(), nullable=True),
+            sa.Column("detected_mood", sa.String(), nullable=False),
+            sa.Column("confidence", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_mood_entries_id", "mood_entries", ["id"])
+
+    if "playlists" not in existing:
+        op.create_table(
+            "playlists",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE")),
+            sa.Column("mood_id", sa.Integer(), sa.ForeignKey("mood_entries.id", ondelete="SET NULL")),
+            sa.Column("playlist_name", sa.String()),
+            sa.Column("playlist_url", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_playlists_id", "playlists", ["id"])
+
+    if "track_logs" not in existing:
+        op.create_table(
+            "track_logs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE")),
+            sa.Column("mood_id", sa.Integer(), sa.ForeignKey("mood_entries.id", ondelete="SET NULL")),
+            sa.Column("track_id", sa.String(), nullable=False),
+            sa.Column("track_name", sa.String(), nullable=False),
+            sa.Column("artist_name", sa.String()),
+            sa.Column("album_name", sa.String()),
+            sa.Column("album_image", sa.String()),
+            sa.Column("spotify_url", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_track_logs_id", "track_logs", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("track_logs")
+    op.drop_table("playlists")
+    op.drop_table("mood_entries")
+    op.drop_table("users")
@@ -0,0 +1,123 @@
+"""Per-user composite indexes, playlist registry columns, jobs and rollup tables
+
+Revision ID: 0002_indexes_jobs_rollups
+Revises: 0001_baseline
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_indexes_jobs_rollups"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # -- Playlist registry: one playlist per (user, mood), linked from each mood entry
+    with op.batch_alter_table("playlists") as batch:
+        batch.add_column(sa.Column("detected_mood", sa.String(), nullable=True))
+        batch.add_column(sa.Column("spotify_playlist_id", sa.String(), nullable=True))
+
+    # Older rows only carry the mood in the "<Mood> Vibes 🎧" name.
+    op.execute(
+        "UPDATE playlists SET detected_mood = lower(replace(playlist_name, ' Vibes 🎧', '')) "
+        "WHERE detected_mood IS NULL AND playlist_name LIKE '% Vibes 🎧'"
+    )
+
+    with op.batch_alter_table("mood_entries") as batch:
+        batch.add_column(sa.Column("playlist_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key(
+            "fk_mood_entries_playlist_id", "playlists", ["playlist_id"], ["id"], ondelete="SET NULL"
+        )
+
+    # -- Background jobs
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_after", sa.DateTime()),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_jobs_id", "jobs", ["id"])
+    op.create_index("ix_jobs_status_run_after", "jobs", ["status", "run_after"])
+
+    # -- Rollups
+    op.create_table(
+        "mood_daily_rollups",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("detected_mood", sa.String(), primary_key=True),
+        sa.Column("entry_count", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "mood_totals",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("detected_mood", sa.String(), primary_key=True),
+        sa.Column("entry_count", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "user_totals",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("mood_count", sa.Integer(), nullable=False),
+        sa.Column("track_count", sa.Integer(), nullable=False),
+    )
+
+    op.execute(
+        "INSERT INTO mood_daily_rollups (user_id, day, detected_mood, entry_count) "
+        "SELECT user_id, date(created_at), detected_mood, count(*) FROM mood_entries "
+        "WHERE user_id IS NOT NULL AND created_at IS NOT NULL "
+        "GROUP BY user_id, date(created_at), detected_mood"
+    )
+    op.execute(
+        "INSERT INTO mood_totals (user_id, detected_mood, entry_count) "
+        "SELECT user_id, detected_mood, count(*) FROM mood_entries WHERE user_id IS NOT NULL "
+        "GROUP BY user_id, detected_mood"
+    )
+    op.execute(
+        "INSERT INTO user_totals (user_id, mood_count, track_count) "
+        "SELECT u.id, "
+        "(SELECT count(*) FROM mood_entries m WHERE m.user_id = u.id), "
+        "(SELECT count(*) FROM track_logs t WHERE t.user_id = u.id) "
+        "FROM users u"
+    )
+
+    # -- Per-user, time-ordered indexes
+    op.create_index(
+        "ix_mood_entries_user_id_created_at", "mood_entries",
+        ["user_id", sa.text("created_at DESC"), sa.text("id DESC")]
+    )
+    op.create_index("ix_mood_entries_user_id_detected_mood", "mood_entries", ["user_id", "detected_mood"])
+    op.create_index("ix_track_logs_user_id_created_at", "track_logs", ["user_id", sa.text("created_at DESC")])
+    op.create_index("ix_playlists_user_id_created_at", "playlists", ["user_id", sa.text("created_at DESC")])
+    op.create_index("ix_playlists_user_id_detected_mood", "playlists", ["user_id", "detected_mood"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_playlists_user_id_detected_mood", table_name="playlists")
+    op.drop_index("ix_playlists_user_id_created_at", table_name="playlists")
+    op.drop_index("ix_track_logs_user_id_created_at", table_name="track_logs")
+    op.drop_index("ix_mood_entries_user_id_detected_mood", table_name="mood_entries")
+    op.drop_index("ix_mood_entries_user_id_created_at", table_name="mood_entries")
+
+    op.drop_table("user_totals")
+    op.drop_table("mood_totals")
+    op.drop_table("mood_daily_rollups")
+    op.drop_table("jobs")
+
+    with op.batch_alter_table("mood_entries") as batch:
+        batch.drop_constraint("fk_mood_entries_playlist_id", type_="foreignkey")
+        batch.drop_column("playlist_id")
+
+    with op.batch_alter_table("playlists") as batch:
+        batch.drop_column("spotify_playlist_id")
+        batch.drop_column("detected_mood")
@@ -0,0 +1,69 @@
+"""Track catalog: move track metadata out of track_logs into a deduplicated tracks table
+
+Revision ID: 0003_track_catalog
+Revises: 0002_indexes_jobs_rollups
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_track_catalog"
+down_revision = "0002_indexes_jobs_rollups"
+branch_labels = None
+depends_on = None
+
+TRACK_COLUMNS = ("track_name", "artist_name", "album_name", "album_image", "spotify_url")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tracks",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("artist_name", sa.String()),
+        sa.Column("album_name", sa.String()),
+        sa.Column("album_image", sa.String()),
+        sa.Column("spotify_url", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+    # Backfill from the most recent log row of each track, so the catalog holds the latest metadata.
+    op.execute(
+        "INSERT INTO tracks (id, name, artist_name, album_name, album_image, spotify_url, created_at, updated_at) "
+        "SELECT t.track_id, t.track_name, t.artist_name, t.album_name, t.album_image, t.spotify_url, "
+        "latest.created_at, t.created_at "
+        "FROM track_logs t "
+        "JOIN (SELECT track_id, max(id) AS last_id, min(created_at) AS created_at "
+        "      FROM track_logs GROUP BY track_id) latest ON latest.last_id = t.id"
+    )
+
+    with op.batch_alter_table("track_logs") as batch:
+        for column in TRACK_COLUMNS:
+            batch.drop_column(column)
+        batch.create_foreign_key("fk_track_logs_track_id", "tracks", ["track_id"], ["id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("track_logs") as batch:
+        batch.drop_constraint("fk_track_logs_track_id", type_="foreignkey")
+        batch.add_column(sa.Column("track_name", sa.String(), nullable=True))
+        batch.add_column(sa.Column("artist_name", sa.String()))
+        batch.add_column(sa.Column("album_name", sa.String()))
+        batch.add_column(sa.Column("album_image", sa.String()))
+        batch.add_column(sa.Column("spotify_url", sa.String()))
+
+    op.execute(
+        "UPDATE track_logs SET "
+        "track_name = (SELECT name FROM tracks WHERE tracks.id = track_logs.track_id), "
+        "artist_name = (SELECT artist_name FROM tracks WHERE tracks.id = track_logs.track_id), "
+        "album_name = (SELECT album_name FROM tracks WHERE tracks.id = track_logs.track_id), "
+        "album_image = (SELECT album_image FROM tracks WHERE tracks.id = track_logs.track_id), "
+        "spotify_url = (SELECT spotify_url FROM tracks WHERE tracks.id = track_logs.track_id)"
+    )
+
+    with op.batch_alter_table("track_logs") as batch:
+        batch.alter_column("track_name", existing_type=sa.String(), nullable=False)
+
+    op.drop_table("tracks")
@@ -0,0 +1,21 @@
+"""Index track_logs.mood_id for mood-to-track joins
+
+Revision ID: 0004_track_logs_mood_id
+Revises: 0003_track_catalog
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0004_track_logs_mood_id"
+down_revision = "0003_track_catalog"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_track_logs_mood_id", "track_logs", ["mood_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_track_logs_mood_id", table_name="track_logs")
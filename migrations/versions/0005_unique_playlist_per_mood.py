@@ -0,0 +1,43 @@
+"""One playlist per (user, mood), enforced by a unique index
+
+Rows from before the registry can repeat a (user, mood) pair. The lowest id is
+the one the registry has been serving; the others keep their history but lose
+their mood so the index can be built.
+
+Revision ID: 0005_unique_playlist_per_mood
+Revises: 0004_track_logs_mood_id
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0005_unique_playlist_per_mood"
+down_revision = "0004_track_logs_mood_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE mood_entries SET playlist_id = ("
+        "  SELECT min(keep.id) FROM playlists p JOIN playlists keep"
+        "    ON keep.user_id = p.user_id AND keep.detected_mood = p.detected_mood"
+        "  WHERE p.id = mood_entries.playlist_id"
+        ") WHERE playlist_id IN ("
+        "  SELECT p.id FROM playlists p WHERE p.detected_mood IS NOT NULL AND p.id > ("
+        "    SELECT min(keep.id) FROM playlists keep"
+        "    WHERE keep.user_id = p.user_id AND keep.detected_mood = p.detected_mood))"
+    )
+    op.execute(
+        "UPDATE playlists SET detected_mood = NULL WHERE detected_mood IS NOT NULL AND id > ("
+        "  SELECT min(keep.id) FROM playlists keep"
+        "  WHERE keep.user_id = playlists.user_id AND keep.detected_mood = playlists.detected_mood)"
+    )
+
+    op.drop_index("ix_playlists_user_id_detected_mood", table_name="playlists")
+    op.create_index("ix_playlists_user_id_detected_mood", "playlists", ["user_id", "detected_mood"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_playlists_user_id_detected_mood", table_name="playlists")
+    op.create_index("ix_playlists_user_id_detected_mood", "playlists", ["user_id", "detected_mood"])
@@ -1,5 +1,5 @@
 # Import
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Float, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from database import Base
@@ -9,6 +9,11 @@ from typing import Optional
 # -- Models app
 # ------------------------------------------------------------------------
 
+# Timestamp columns are "timestamp without time zone" holding UTC. Bind naive values: asyncpg
+# rejects timezone-aware datetimes for them.
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -21,7 +26,7 @@ class User(Base):
     token_expires_at = Column(DateTime)
 
     auto_create_enabled = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
 
     moods = relationship("MoodEntry", back_populates="user", cascade="all,delete")
     playlists = relationship("Playlist", back_populates="user", cascade="all,delete")
@@ -36,25 +41,49 @@ class MoodEntry(Base):
     image_url = Column(String, nullable=True)
     detected_mood = Column(String, nullable=False)
     confidence: Optional[float] = Column(Float, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    playlist_id = Column(
+        Integer, ForeignKey("playlists.id", ondelete="SET NULL", use_alter=True, name="fk_mood_entries_playlist_id"),
+        nullable=True
+    )
+    created_at = Column(DateTime, default=utcnow)
 
     user = relationship("User", back_populates="moods")
-    playlist = relationship("Playlist", back_populates="mood", uselist=False)
+    playlist = relationship("Playlist", back_populates="entries", foreign_keys=[playlist_id], post_update=True)
     track = relationship("TrackLog", back_populates="mood", uselist=False)
 
 class Playlist(Base):
     __tablename__ = "playlists"
+    __table_args__ = (
+        # One playlist per mood; the registry lock only covers a single process.
+        Index("ix_playlists_user_id_detected_mood", "user_id", "detected_mood", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    mood_id = Column(Integer, ForeignKey("mood_entries.id", ondelete="SET NULL"))
+    mood_id = Column(Integer, ForeignKey("mood_entries.id", ondelete="SET NULL"))    # entry that created it
 
+    detected_mood = Column(String, nullable=True)
+    spotify_playlist_id = Column(String, nullable=True)
     playlist_name = Column(String)
     playlist_url = Column(String)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
 
     user = relationship("User", back_populates="playlists")
-    mood = relationship("MoodEntry", back_populates="playlist")
+    mood = relationship("MoodEntry", foreign_keys=[mood_id])
+    entries = relationship("MoodEntry", back_populates="playlist", foreign_keys="MoodEntry.playlist_id")
+
+# One row per Spotify track, shared by every log entry that played it (see track_catalog.py).
+class Track(Base):
+    __tablename__ = "tracks"
+
+    id = Column(String, primary_key=True)      # Spotify track id
+    name = Column(String, nullable=False)
+    artist_name = Column(String)
+    album_name = Column(String)
+    album_image = Column(String)
+    spotify_url = Column(String)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
 class TrackLog(Base):
     __tablename__ = "track_logs"
@@ -62,14 +91,66 @@ class TrackLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     mood_id = Column(Integer, ForeignKey("mood_entries.id", ondelete="SET NULL"))
-
-    track_id = Column(String, nullable=False)
-    track_name = Column(String, nullable=False)
-    artist_name = Column(String)
-    album_name = Column(String)
-    album_image = Column(String)
-    spotify_url = Column(String)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    track_id = Column(String, ForeignKey("tracks.id"), nullable=False)
+    created_at = Column(DateTime, default=utcnow)
 
     user = relationship("User", back_populates="tracks")
     mood = relationship("MoodEntry", back_populates="track")
+    track = relationship("Track")
+
+# Pre-aggregated counts, kept in step with mood_entries / track_logs by rollups.py.
+class MoodDailyRollup(Base):
+    __tablename__ = "mood_daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    detected_mood = Column(String, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+class MoodTotal(Base):
+    __tablename__ = "mood_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    detected_mood = Column(String, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+class UserTotals(Base):
+    __tablename__ = "user_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    mood_count = Column(Integer, nullable=False, default=0)
+    track_count = Column(Integer, nullable=False, default=0)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+
+    status = Column(String, nullable=False, default="queued")     # queued | running | retry | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, default=utcnow)
+    last_error = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+# ------------------------------------------------------------------------
+# -- Indexes
+# ------------------------------------------------------------------------
+# Every per-user read is "WHERE user_id = ? ORDER BY created_at DESC"; these make them index range scans.
+# Schema changes go through Alembic (migrations/); keep these in step with the latest revision.
+
+Index("ix_mood_entries_user_id_created_at", MoodEntry.user_id, MoodEntry.created_at.desc(), MoodEntry.id.desc())
+Index("ix_mood_entries_user_id_detected_mood", MoodEntry.user_id, MoodEntry.detected_mood)
+Index("ix_track_logs_user_id_created_at", TrackLog.user_id, TrackLog.created_at.desc())
+# /mood/insights and the side-effect job's retry check reach track_logs through mood_id.
+Index("ix_track_logs_mood_id", TrackLog.mood_id)
+Index("ix_playlists_user_id_created_at", Playlist.user_id, Playlist.created_at.desc())
@@ -0,0 +1,78 @@
+# Imports
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Job, MoodEntry, Track, TrackLog, User
+from spotify_helpers import AutoCreatePlaylistIfEnabled, EnsureFreshAccessToken
+from spotify_client import spotify
+from jobs import enqueue, job_handler
+from track_catalog import track_catalog, track_from_item
+from live_events import live_events, track_events
+from schemas import TrackItem
+
+# -----------------------------------------------------------------------------
+# -- Mood Side-Effect Jobs
+# -----------------------------------------------------------------------------
+
+MOOD_SIDE_EFFECTS = "mood_side_effects"
+
+async def EnqueueMoodSideEffects(db: AsyncSession, user_id: int, entry_id: int, log_track: bool) -> Job:
+    return await enqueue(db, MOOD_SIDE_EFFECTS, {"entry_id": entry_id, "log_track": log_track}, user_id=user_id)
+
+async def _log_currently_playing(user: User, entry: MoodEntry, db: AsyncSession) -> dict | None:
+    # Retries must not log the same track twice.
+    existing = (await db.execute(
+        select(Track.id, Track.name, Track.artist_name)
+        .join(TrackLog, TrackLog.track_id == Track.id)
+        .where(TrackLog.mood_id == entry.id)
+        .limit(1)
+    )).first()
+    if existing:
+        return {"track_id": existing.id, "track_name": existing.name, "artist": existing.artist_name}
+
+    # Best-effort, same as when it ran inline. The session is the job's, so nothing here may roll it
+    # back: Spotify errors just skip logging, and the writes go in a savepoint.
+    try:
+        r = await spotify.get_currently_playing(await EnsureFreshAccessToken(user, db))
+    except Exception as e:
+        print("Spotify logging failed:", e)
+        return None
+
+    if r.status_code != 200:
+        return None
+
+    item = r.json().get("item")
+    if not item:
+        return None
+
+    track = track_from_item(item)
+    try:
+        async with db.begin_nested():
+            await track_catalog.ensure(db, track)
+            log = TrackLog(user_id=user.id, mood_id=entry.id, track_id=track.id)
+            db.add(log); await db.flush()
+    except Exception as e:
+        print("Track logging failed:", e)
+        return None
+
+    live_events.publish_after_commit(db, user.id, track_events(TrackItem(
+        track_name=track.name, artist=track.artist_name, album=track.album_name, image=track.album_image,
+        mood=entry.detected_mood, time=log.created_at,
+    ).model_dump(mode="json")))
+    await db.commit()
+
+    return {"track_id": track.id, "track_name": track.name, "artist": track.artist_name}
+
+@job_handler(MOOD_SIDE_EFFECTS)
+async def _run_mood_side_effects(db: AsyncSession, job: Job) -> dict:
+    entry = await db.get(MoodEntry, job.payload["entry_id"])
+    if entry is None:
+        return {"playlist_url": None, "track": None}
+
+    user = await db.get(User, entry.user_id)
+    track = await _log_currently_playing(user, entry, db) if job.payload.get("log_track") else None
+
+    playlist_url = await AutoCreatePlaylistIfEnabled(user, entry.detected_mood, db, entry_id=entry.id)
+    if user.auto_create_enabled and playlist_url is None:
+        raise RuntimeError("Playlist creation failed.")
+
+    return {"playlist_url": playlist_url, "track": track}
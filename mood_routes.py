@@ -1,17 +1,27 @@
 # Imports
-from fastapi import APIRouter, UploadFile, File, Form, Depends, Request, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import get_db
-from models import MoodEntry, User, TrackLog
-from spotify_helpers import AutoCreatePlaylistIfEnabled, EnsureFreshAccessToken
-from security import verify_session_jwt
-from datetime import datetime, timedelta, timezone
-
-import tempfile, shutil, os, random, requests
-os.environ["DEEPFACE_BACKEND"] = "opencv"
-
-from deepface import DeepFace
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, AsyncSessionLocal
+from models import MoodEntry, Job, utcnow
+from queries import InvalidCursor, history_item, history_query, mood_history_page, mood_stats, mood_trends, recent_tracks
+from schemas import EmojiBatch, MoodHistoryItem, MoodStats, TrackItem
+from mood_jobs import EnqueueMoodSideEffects
+from rollups import apply_mood_counts
+from session_auth import UserSnapshot, current_user
+from inference_batcher import inference_batcher, InferenceQueueFull, RETRY_AFTER_SEC, INFERENCE_TIMEOUT_SEC
+from image_pipeline import ImageRejected, prepare_selfie
+from emotion_cache import emotion_cache
+from live_events import TooManySubscribers, live_events, mood_events
+from insights import history_frame_query, insights_cache, insights_from_rows, invalidate_after_commit
+from metrics import observe_emotion_cache, observe_inference, observe_selfie, observe_selfie_rejected
+from datetime import timezone
+from typing import Literal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import asyncio, time, random
 
 # ---------------------------------------------------------------------
 # -- Mood Routes
@@ -38,173 +48,225 @@ EMOJI_TO_MOOD = {
 
 MOODS = list(set(EMOJI_TO_MOOD.values()))
 
-def _require_user(request: Request, db: Session) -> User:
-    token = request.cookies.get("ss_session")
-    sid = verify_session_jwt(token) if token else None
-    if not sid:
-        raise HTTPException(status_code=401, detail="Login required.")
-
-    user : User | None = db.query(User).filter_by(spotify_id=sid).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found.")
-
-    EnsureFreshAccessToken(user, db)
-
-    return user
-
 @router.post("/emoji")
-def mood_from_emoji(request: Request, emoji: str = Form(...), db: Session = Depends(get_db)):
-    user = _require_user(request, db)
+async def mood_from_emoji(emoji: str = Form(...), user: UserSnapshot = Depends(current_user),
+                          db: AsyncSession = Depends(get_async_db)):
     detected = EMOJI_TO_MOOD.get(emoji, "neutral")
     entry = MoodEntry(user_id=user.id, emoji=emoji, detected_mood=detected, confidence=None)
-    db.add(entry); db.commit(); db.refresh(entry)
-
-    playlist_url = AutoCreatePlaylistIfEnabled(user, detected, db)
-    if playlist_url:
-        entry.playlist = entry.playlist or None
+    db.add(entry); await db.flush()
+    live_events.publish_after_commit(db, user.id, mood_events([history_item(entry).model_dump(mode="json")]))
+
+    job = await EnqueueMoodSideEffects(db, user.id, entry.id, log_track=False) if user.auto_create_enabled else None
+    await db.commit()
+
+    return {"detected_mood": detected, "entry_id": entry.id, "job_id": job.id if job else None}
+
+@router.post("/emoji/batch")
+async def mood_from_emoji_batch(batch: EmojiBatch, user: UserSnapshot = Depends(current_user),
+                                db: AsyncSession = Depends(get_async_db)):
+    # Offline check-ins replayed by the mobile client: one transaction and one insert for the whole queue.
+    if not batch.entries:
+        return {"entries": [], "job_ids": {}}
+
+    now = utcnow()
+    rows = []
+    for item in batch.entries:
+        created_at = item.created_at
+        # Stored as naive UTC, like every other timestamp column.
+        if created_at.tzinfo:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        rows.append({
+            "user_id": user.id, "emoji": item.emoji, "detected_mood": EMOJI_TO_MOOD.get(item.emoji, "neutral"),
+            "confidence": None, "created_at": min(created_at, now),
+        })
+
+    result = await db.execute(insert(MoodEntry).returning(MoodEntry.id, sort_by_parameter_order=True), rows)
+    ids = result.scalars().all()
+
+    # Core inserts skip the after_flush rollup hook, so count them here in the same transaction.
+    await db.run_sync(lambda s: apply_mood_counts(s.connection(), ((r["user_id"], r["created_at"], r["detected_mood"]) for r in rows)))
+    invalidate_after_commit(db, user.id)
+    live_events.publish_after_commit(db, user.id, mood_events([
+        {"id": entry_id, "emoji": r["emoji"], "detected_mood": r["detected_mood"], "confidence": None,
+         "created_at": r["created_at"].isoformat()}
+        for entry_id, r in zip(ids, rows)
+    ]))
+
+    # One side-effect job per distinct mood, attached to its most recent check-in.
+    job_ids = {}
+    if user.auto_create_enabled:
+        latest = {}
+        for entry_id, row in zip(ids, rows):
+            if row["detected_mood"] not in latest or row["created_at"] >= latest[row["detected_mood"]][1]:
+                latest[row["detected_mood"]] = (entry_id, row["created_at"])
+        for mood, (entry_id, _) in latest.items():
+            job_ids[mood] = (await EnqueueMoodSideEffects(db, user.id, entry_id, log_track=False)).id
+    await db.commit()
 
-    return {"detected_mood": detected, "entry_id": entry.id, "playlist_url": playlist_url}
+    return {
+        "entries": [{"entry_id": entry_id, "detected_mood": row["detected_mood"]} for entry_id, row in zip(ids, rows)],
+        "job_ids": job_ids,
+    }
 
 @router.post("/selfie")
-def mood_from_selfie(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    user = _require_user(request, db)
-
-    temp_dir = tempfile.mkdtemp()
-    temp_path = os.path.join(temp_dir, file.filename)
-
-    with open(temp_path, "wb") as f:
-        shutil.copyfileobj(file.file, f, length=1024 * 1024)
-
+async def mood_from_selfie(file: UploadFile = File(...), user: UserSnapshot = Depends(current_user),
+                           db: AsyncSession = Depends(get_async_db)):
+    # Async so inference waits on the worker pool, not on a thread the cheap endpoints need.
+    # Upload size is capped by UploadLimitMiddleware before the body is parsed.
+    data = await file.read()
+
+    # Retried or resubmitted photos are answered from the result cache without decoding.
+    digest = await run_in_threadpool(emotion_cache.digest, data)
+    cached = emotion_cache.get_exact(digest)
+    cache_status = "exact" if cached else None
+    if cached is None:
+        start = time.perf_counter()
+        try:
+            prepared = await run_in_threadpool(prepare_selfie, data)
+        except ImageRejected as e:
+            observe_selfie_rejected(e.reason)
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        observe_selfie(len(data), prepared.original_size, prepared.processed_size, time.perf_counter() - start)
+
+        cached = emotion_cache.get_similar(user.id, prepared.dhash)
+        cache_status = "similar" if cached else None
+    observe_emotion_cache(cache_status or "miss")
+
+    start = time.perf_counter()
     try:
-        analysis = DeepFace.analyze(img_path=temp_path, actions=["emotion"], detector_backend="opencv", enforce_detection=False)
-        detected = analysis[0]["dominant_emotion"]
-        confidence = float(analysis[0]["emotion"].get(detected, 0))
+        if cached:
+            result = cached
+            inference_ms = 0.0
+        else:
+            result = await asyncio.wait_for(asyncio.wrap_future(inference_batcher.submit(prepared.image)), INFERENCE_TIMEOUT_SEC)
+            inference_ms = result.inference_ms
+            observe_inference(time.perf_counter() - start, inference_ms / 1000)
+            emotion_cache.put(digest, user.id, prepared.dhash, result)
+        detected = result.mood
+        confidence = result.confidence
+    except (InferenceQueueFull, asyncio.TimeoutError):
+        raise HTTPException(
+            status_code=503, detail="Selfie analysis is busy, try again shortly.",
+            headers={"Retry-After": str(RETRY_AFTER_SEC)}
+        )
     except Exception as e:
         print(f"DeepFace analysis failed:  {e}")
         detected = random.choice(MOODS)
         confidence = None
+        inference_ms = round((time.perf_counter() - start) * 1000, 2)
 
-    finally:
-        shutil.rmtree(temp_dir)
+    entry = MoodEntry(user_id=user.id, detected_mood=detected, confidence=confidence)
+    db.add(entry); await db.flush()
+    live_events.publish_after_commit(db, user.id, mood_events([history_item(entry).model_dump(mode="json")]))
 
-    entry = MoodEntry(user_id=user.id, image_url=file.filename, detected_mood=detected, confidence=confidence)
-    db.add(entry); db.commit(); db.refresh(entry)
-
-    try:
-        headers = {"Authorization": f"Bearer {user.access_token}"}
-        r = requests.get("https://api.spotify.com/v1/me/player/currently-playing", headers=headers)
-        if r.status_code == 200:
-
-            data = r.json()
-            if data.get("item"):
-                item = data["item"]
-                track = TrackLog(
-                    user_id=user.id,
-                    mood_id=entry.id,
-                    track_id=item["id"],
-                    track_name=item["name"],
-                    artist_name=", ".join(a["name"] for a in item["artists"]),
-                    album_name=item["album"]["name"],
-                    album_image=item["album"]["images"][0]["url"],
-                    spotify_url=item["external_urls"]["spotify"]
-                )
-                db.add(track); db.commit()
-    except Exception as e:
-        print("Spotify logging failed:", e)
-
-    playlist_url = AutoCreatePlaylistIfEnabled(user, detected, db)
+    # Track logging and playlist creation run on the job queue; poll /mood/jobs/{job_id} for them.
+    job = await EnqueueMoodSideEffects(db, user.id, entry.id, log_track=True)
+    await db.commit()
 
     return {
         "detected_mood": detected,
         "confidence": confidence,
+        "inference_ms": inference_ms,
+        "cached": cache_status,
         "entry_id": entry.id,
-        "playlist_url": playlist_url
+        "job_id": job.id
     }
 
-@router.get("/history")
-def get_mood_history(request: Request, days: int | None = None, db: Session = Depends(get_db)):
-    user = _require_user(request, db)
-    query = db.query(MoodEntry).filter_by(user_id=user.id).order_by(MoodEntry.created_at.desc())
-
-    if days:
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        query = query.filter(MoodEntry.created_at >= cutoff)
-
-    moods = query.all()
-
-    return [
-        {
-            "id": m.id,
-            "emoji": m.emoji,
-            "detected_mood": m.detected_mood,
-            "confidence": m.confidence,
-            "created_at": m.created_at.isoformat(),
-        }
-        for m in moods
-    ]
-
-@router.get("/stats")
-def get_mood_stats(request: Request, db: Session = Depends(get_db)):
-    user = _require_user(request, db)
-
-    mood_counts = (
-        db.query(MoodEntry.detected_mood, func.count(MoodEntry.id))
-        .filter_by(user_id=user.id)
-        .group_by(MoodEntry.detected_mood)
-        .all()
-    )
-
-    total = sum(c for _, c in mood_counts)
-    mood_stats = [
-        {"mood": mood, "count": count, "percent": round(count / total * 100, 1)}
-        for mood, count, in mood_counts
-    ]
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: int, user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    job = (await db.execute(select(Job).where(Job.id == job_id, Job.user_id == user.id))).scalars().first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
 
-    track_count = db.query(TrackLog).filter_by(user_id=user.id).count()
+    result = job.result or {}
 
     return {
-        "total_moods": total,
-        "total_tracks_logged": track_count,
-        "moods": mood_stats,
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "playlist_url": result.get("playlist_url"),
+        "track": result.get("track"),
+        "error": job.last_error if job.status == "failed" else None,
     }
 
-@router.get("/trends")
-def get_mood_trends(request: Request, db: Session = Depends(get_db)):
-    user = _require_user(request, db)
-
-    results = (
-        db.query(func.date(MoodEntry.created_at).label("date"), MoodEntry.detected_mood, func.count(MoodEntry.id).label("count"))
-        .filter_by(user_id=user.id)
-        .group_by("date", MoodEntry.detected_mood)
-        .order_by("date")
-        .all()
-    )
+@router.get("/events")
+async def mood_events_stream(user: UserSnapshot = Depends(current_user)):
+    # Server-sent events: new moods, tracks, playlists and stats deltas as they are committed.
+    # Clients load /history, /stats and /tracks once, then apply these; `resync` means refetch.
+    try:
+        q = live_events.subscribe(user.id)
+    except TooManySubscribers:
+        raise HTTPException(status_code=429, detail="Too many open event streams.")
 
-    grouped = {}
-    for date, mood, count in results:
-        grouped.setdefault(str(date), {})[mood] = count
-
-    return grouped
-
-@router.get("/tracks")
-def get_tracks(request: Request, db: Session = Depends(get_db)):
-    user = _require_user(request, db)
-    tracks = (
-        db.query(TrackLog)
-        .filter_by(user_id=user.id)
-        .order_by(TrackLog.created_at.desc())
-        .limit(20)
-        .all()
+    return StreamingResponse(
+        live_events.stream(user.id, q), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    return [
-        {
-            "track_name": t.track_name,
-            "artist": t.artist_name,
-            "album": t.album_name,
-            "image": t.album_image,
-            "mood": t.mood.detected_mood if t.mood else None,
-            "time": t.created_at.isoformat(),
-        }
-        for t in tracks
-    ]
+@router.get("/inference/stats")
+def get_inference_stats():
+    return {**inference_batcher.stats(), "result_cache": emotion_cache.stats()}
+
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
+HISTORY_STREAM_BATCH = 500
+
+async def _stream_history(stmt):
+    # Own session: the request-scoped one may be closed before the body finishes streaming.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=HISTORY_STREAM_BATCH))
+        async for row in result:
+            yield history_item(row).model_dump_json() + "\n"
+
+@router.get("/history", response_model=list[MoodHistoryItem])
+async def get_mood_history(response: Response, days: int | None = None, cursor: str | None = None,
+                           limit: int | None = Query(None, ge=1, le=HISTORY_MAX_LIMIT),
+                           format: Literal["json", "ndjson"] = "json",
+                           user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    try:
+        if format == "ndjson":
+            stmt = history_query(user.id, days, cursor)
+            return StreamingResponse(_stream_history(stmt.limit(limit) if limit else stmt), media_type="application/x-ndjson")
+
+        # Without a limit or cursor this is the whole list, as it has always been. Paging clients get
+        # the cursor for the next page in X-Next-Cursor; it is absent on the last page.
+        if cursor is not None and limit is None:
+            limit = HISTORY_DEFAULT_LIMIT
+        page = await mood_history_page(db, user.id, limit, days, cursor)
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+
+        return page.items
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@router.get("/stats", response_model=MoodStats)
+async def get_mood_stats(user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    return await mood_stats(db, user.id)
+
+@router.get("/trends")
+async def get_mood_trends(user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    return await mood_trends(db, user.id)
+
+@router.get("/tracks", response_model=list[TrackItem])
+async def get_tracks(user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    return await recent_tracks(db, user.id)
+
+@router.get("/insights")
+async def get_mood_insights(tz: str = "UTC", window: int = Query(7, ge=1, le=90), days: int = Query(90, ge=1, le=366),
+                            user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown time zone.")
+
+    params = (tz, window, days)
+    result = insights_cache.get(user.id, params)
+    if result is None:
+        generation = insights_cache.generation(user.id)
+        rows = (await db.execute(history_frame_query(user.id))).all()
+        # pandas / numpy work is CPU-bound; keep it off the event loop.
+        result = await run_in_threadpool(insights_from_rows, rows, tz, window, days)
+        insights_cache.put(user.id, generation, params, result)
+
+    return result
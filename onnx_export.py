@@ -0,0 +1,83 @@
+# Imports
+from pathlib import Path
+
+import argparse
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# -- ONNX Export
+#
+# Exports DeepFace's Keras emotion CNN to ONNX for EMOTION_BACKEND=onnx, and
+# optionally writes an int8-quantized copy next to it. Needs the full DeepFace /
+# TensorFlow stack plus tf2onnx, so run it at build time, not in the API image:
+#
+#   pip install tf2onnx
+#   python onnx_export.py --out models/emotion.onnx --quantize
+#   python onnx_export.py --out models/emotion.onnx --quantize --calibration-dir selfies/
+#
+# Without --calibration-dir quantization is dynamic (weights only); with it,
+# activations are calibrated on those images too (static QDQ, per channel).
+# -----------------------------------------------------------------------------
+
+def export(out: Path, opset: int) -> None:
+    import tensorflow as tf
+    import tf2onnx
+    from deepface.modules import modeling
+
+    model = modeling.build_model(task="facial_attribute", model_name="Emotion").model
+    spec = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input"),)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(out))
+
+    # Sanity check against the Keras model on random faces.
+    import onnxruntime as ort
+
+    sample = np.random.default_rng(0).random((8, 48, 48, 1), dtype=np.float32)
+    session = ort.InferenceSession(str(out), providers=["CPUExecutionProvider"])
+    diff = np.abs(session.run(None, {session.get_inputs()[0].name: sample})[0] - model.predict(sample, verbose=0)).max()
+    print(f"Exported {out} (max abs diff vs Keras: {diff:.2e})")
+
+class _SelfieCalibration:
+    def __init__(self, input_name: str, calibration_dir: Path, limit: int):
+        import cv2
+        from emotion_service import crop_largest_face, emotion_input, haar_face_detector
+
+        detector = haar_face_detector()
+        files = sorted(p for p in calibration_dir.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))[:limit]
+        tensors = [emotion_input(crop_largest_face(cv2.imread(str(p)), detector)) for p in files]
+        self._batches = iter([{input_name: t[np.newaxis, ..., np.newaxis].astype(np.float32)} for t in tensors])
+
+    def get_next(self):
+        return next(self._batches, None)
+
+def quantize(src: Path, dst: Path, calibration_dir: Path | None, limit: int) -> None:
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    import onnxruntime as ort
+
+    if calibration_dir is None:
+        quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    else:
+        input_name = ort.InferenceSession(str(src), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        quantize_static(
+            str(src), str(dst), _SelfieCalibration(input_name, calibration_dir, limit),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QInt8, weight_type=QuantType.QInt8,
+        )
+
+    print(f"Quantized {dst} ({src.stat().st_size / 1e6:.1f} MB -> {dst.stat().st_size / 1e6:.1f} MB)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the emotion model to ONNX.")
+    parser.add_argument("--out", type=Path, default=Path("models/emotion.onnx"))
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--quantize", action="store_true", help="also write <out>.int8.onnx")
+    parser.add_argument("--calibration-dir", type=Path, default=None)
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    args = parser.parse_args()
+
+    export(args.out, args.opset)
+    if args.quantize:
+        quantize(args.out, args.out.with_suffix(".int8.onnx"), args.calibration_dir, args.calibration_limit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Imports
+from collections import defaultdict
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import TTLCache
+from models import Playlist
+
+import os, asyncio
+
+# -----------------------------------------------------------------------------
+# -- Playlist Registry
+# -----------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class PlaylistRef:
+    id: int
+    url: str
+
+class PlaylistRegistry:
+    def __init__(self):
+        self._cache = TTLCache(maxsize=int(os.getenv("PLAYLIST_CACHE_SIZE", "20000")), ttl=3600)
+        self._locks: defaultdict[tuple[int, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def lock(self, user_id: int, mood: str) -> asyncio.Lock:
+        # Held around lookup + create so two concurrent entries with the same mood make one playlist.
+        return self._locks[(user_id, mood)]
+
+    async def lookup(self, db: AsyncSession, user_id: int, mood: str) -> PlaylistRef | None:
+        ref = self._cache.get((user_id, mood))
+        if ref:
+            return ref
+
+        row = (await db.execute(
+            select(Playlist.id, Playlist.playlist_url)
+            .where(Playlist.user_id == user_id, Playlist.detected_mood == mood)
+            .order_by(Playlist.id)
+            .limit(1)
+        )).first()
+        if row is None:
+            return None
+
+        return self.remember(user_id, mood, PlaylistRef(id=row.id, url=row.playlist_url))
+
+    def remember(self, user_id: int, mood: str, ref: PlaylistRef) -> PlaylistRef:
+        self._cache.set((user_id, mood), ref)
+
+        return ref
+
+    def forget(self, user_id: int, mood: str) -> None:
+        self._cache.pop((user_id, mood))
+
+playlist_registry = PlaylistRegistry()
@@ -0,0 +1,128 @@
+# Imports
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import MoodEntry, Track, TrackLog, MoodDailyRollup, MoodTotal, UserTotals, utcnow
+from schemas import MoodHistoryItem, MoodHistoryPage, MoodStat, MoodStats, TrackItem
+
+import base64, json
+
+# -----------------------------------------------------------------------------
+# -- Read Queries
+#
+# Column projections for the read endpoints: one statement per call, plain rows
+# in, response models out, no ORM objects loaded into the session.
+# -----------------------------------------------------------------------------
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(created_at: datetime, entry_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), entry_id]).encode()
+
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, entry_id = json.loads(raw)
+
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return created_at, int(entry_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+def history_query(user_id: int, days: int | None = None, cursor: str | None = None) -> Select:
+    # Keyset pagination on (created_at, id): each page is an index range scan, however deep it is.
+    stmt = (
+        select(MoodEntry.id, MoodEntry.emoji, MoodEntry.detected_mood, MoodEntry.confidence, MoodEntry.created_at)
+        .where(MoodEntry.user_id == user_id)
+        .order_by(MoodEntry.created_at.desc(), MoodEntry.id.desc())
+    )
+
+    if days:
+        cutoff = utcnow() - timedelta(days=days)
+        stmt = stmt.where(MoodEntry.created_at >= cutoff)
+
+    if cursor:
+        stmt = stmt.where(tuple_(MoodEntry.created_at, MoodEntry.id) < tuple_(*decode_cursor(cursor)))
+
+    return stmt
+
+def history_item(row) -> MoodHistoryItem:
+    return MoodHistoryItem(
+        id=row.id, emoji=row.emoji, detected_mood=row.detected_mood, confidence=row.confidence, created_at=row.created_at
+    )
+
+async def mood_history_page(db: AsyncSession, user_id: int, limit: int | None, days: int | None = None,
+                            cursor: str | None = None) -> MoodHistoryPage:
+    stmt = history_query(user_id, days, cursor)
+    if limit is None:
+        return MoodHistoryPage(items=[history_item(r) for r in (await db.execute(stmt)).all()], next_cursor=None)
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+
+    return MoodHistoryPage(items=[history_item(r) for r in rows[:limit]], next_cursor=next_cursor)
+
+async def mood_stats(db: AsyncSession, user_id: int) -> MoodStats:
+    rows = (await db.execute(
+        select(UserTotals.mood_count, UserTotals.track_count, MoodTotal.detected_mood, MoodTotal.entry_count)
+        .outerjoin(MoodTotal, MoodTotal.user_id == UserTotals.user_id)
+        .where(UserTotals.user_id == user_id)
+    )).all()
+    if not rows:
+        return MoodStats(total_moods=0, total_tracks_logged=0, moods=[])
+
+    total = rows[0].mood_count
+
+    return MoodStats(
+        total_moods=total,
+        total_tracks_logged=rows[0].track_count,
+        moods=[
+            MoodStat(mood=r.detected_mood, count=r.entry_count, percent=round(r.entry_count / total * 100, 1))
+            for r in rows if r.entry_count
+        ],
+    )
+
+async def mood_trends(db: AsyncSession, user_id: int) -> dict[str, dict[str, int]]:
+    rows = (await db.execute(
+        select(MoodDailyRollup.day, MoodDailyRollup.detected_mood, MoodDailyRollup.entry_count)
+        .where(MoodDailyRollup.user_id == user_id)
+        .order_by(MoodDailyRollup.day)
+    )).all()
+
+    grouped = {}
+    for day, mood, count in rows:
+        grouped.setdefault(str(day), {})[mood] = count
+
+    return grouped
+
+def recent_tracks_query(user_id: int, limit: int = 20) -> Select:
+    # The (user_id, created_at) index orders the compact log rows; the catalog is then a primary-key
+    # lookup per returned row.
+    return (
+        select(
+            Track.name, Track.artist_name, Track.album_name, Track.album_image,
+            TrackLog.created_at, MoodEntry.detected_mood,
+        )
+        .join(Track, Track.id == TrackLog.track_id)
+        .outerjoin(MoodEntry, MoodEntry.id == TrackLog.mood_id)
+        .where(TrackLog.user_id == user_id)
+        .order_by(TrackLog.created_at.desc())
+        .limit(limit)
+    )
+
+async def recent_tracks(db: AsyncSession, user_id: int, limit: int = 20) -> list[TrackItem]:
+    rows = (await db.execute(recent_tracks_query(user_id, limit))).all()
+
+    return [
+        TrackItem(
+            track_name=r.name, artist=r.artist_name, album=r.album_name, image=r.album_image,
+            mood=r.detected_mood, time=r.created_at,
+        )
+        for r in rows
+    ]
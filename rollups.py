@@ -0,0 +1,114 @@
+# Imports
+from collections import Counter
+from datetime import datetime
+from typing import Iterable
+from sqlalchemy import Connection, delete, event, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models import User, MoodEntry, TrackLog, MoodDailyRollup, MoodTotal, UserTotals
+
+import argparse
+
+# -----------------------------------------------------------------------------
+# -- Mood Rollups
+#
+# mood_daily_rollups, mood_totals and user_totals are updated in the same
+# transaction as the mood_entries / track_logs rows they count (after_flush
+# hook below), so /mood/stats and /mood/trends never scan raw history.
+# Writers that bypass the ORM unit of work (bulk Core inserts) call
+# apply_mood_counts / apply_track_counts themselves.
+#
+#   python rollups.py rebuild [--user-id N]
+# -----------------------------------------------------------------------------
+
+def _upsert(conn: Connection, model, rows: list[dict], keys: list[str], counters: list[str]) -> None:
+    if not rows:
+        return
+
+    insert_fn = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert_fn(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: model.__table__.c[c] + stmt.excluded[c] for c in counters},
+    )
+    conn.execute(stmt, rows)
+
+def apply_mood_counts(conn: Connection, entries: Iterable[tuple[int, datetime, str]]) -> None:
+    daily, totals, users = Counter(), Counter(), Counter()
+    for user_id, created_at, mood in entries:
+        daily[(user_id, created_at.date(), mood)] += 1
+        totals[(user_id, mood)] += 1
+        users[user_id] += 1
+
+    _upsert(conn, MoodDailyRollup, [
+        {"user_id": u, "day": d, "detected_mood": m, "entry_count": n} for (u, d, m), n in daily.items()
+    ], ["user_id", "day", "detected_mood"], ["entry_count"])
+    _upsert(conn, MoodTotal, [
+        {"user_id": u, "detected_mood": m, "entry_count": n} for (u, m), n in totals.items()
+    ], ["user_id", "detected_mood"], ["entry_count"])
+    _upsert(conn, UserTotals, [
+        {"user_id": u, "mood_count": n, "track_count": 0} for u, n in users.items()
+    ], ["user_id"], ["mood_count"])
+
+def apply_track_counts(conn: Connection, user_ids: Iterable[int]) -> None:
+    _upsert(conn, UserTotals, [
+        {"user_id": u, "mood_count": 0, "track_count": n} for u, n in Counter(user_ids).items()
+    ], ["user_id"], ["track_count"])
+
+@event.listens_for(Session, "after_flush")
+def _apply_rollups(session: Session, flush_context) -> None:
+    moods = [o for o in session.new if isinstance(o, MoodEntry)]
+    tracks = [o for o in session.new if isinstance(o, TrackLog)]
+    if not moods and not tracks:
+        return
+
+    conn = session.connection()
+    if moods:
+        apply_mood_counts(conn, ((m.user_id, m.created_at, m.detected_mood) for m in moods))
+    if tracks:
+        apply_track_counts(conn, (t.user_id for t in tracks))
+
+def rebuild(conn: Connection, user_id: int | None = None) -> None:
+    def scoped(stmt, model):
+        return stmt.where(model.user_id == user_id) if user_id is not None else stmt
+
+    for model in (MoodDailyRollup, MoodTotal, UserTotals):
+        conn.execute(scoped(delete(model), model))
+
+    day = func.date(MoodEntry.created_at)
+    entries = select(MoodEntry.user_id).where(MoodEntry.user_id.is_not(None), MoodEntry.created_at.is_not(None))
+    conn.execute(insert(MoodDailyRollup).from_select(
+        ["user_id", "day", "detected_mood", "entry_count"],
+        scoped(entries.add_columns(day, MoodEntry.detected_mood, func.count())
+               .group_by(MoodEntry.user_id, day, MoodEntry.detected_mood), MoodEntry),
+    ))
+    conn.execute(insert(MoodTotal).from_select(
+        ["user_id", "detected_mood", "entry_count"],
+        scoped(entries.add_columns(MoodEntry.detected_mood, func.count())
+               .group_by(MoodEntry.user_id, MoodEntry.detected_mood), MoodEntry),
+    ))
+
+    mood_count = select(func.count()).where(MoodEntry.user_id == User.id).scalar_subquery()
+    track_count = select(func.count()).where(TrackLog.user_id == User.id).scalar_subquery()
+    users = select(User.id, mood_count, track_count)
+    conn.execute(insert(UserTotals).from_select(
+        ["user_id", "mood_count", "track_count"],
+        users.where(User.id == user_id) if user_id is not None else users,
+    ))
+
+def main() -> None:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Maintain the mood rollup tables.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="Recompute rollups from mood_entries / track_logs.")
+    rebuild_cmd.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        rebuild(conn, args.user_id)
+    print("Rollups rebuilt" + (f" for user {args.user_id}." if args.user_id is not None else "."))
+
+if __name__ == "__main__":
+    main()
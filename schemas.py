@@ -0,0 +1,52 @@
+# Imports
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+import os
+
+# -----------------------------------------------------------------------------
+# -- Response Schemas
+# -----------------------------------------------------------------------------
+
+class MoodHistoryItem(BaseModel):
+    id: int
+    emoji: str | None
+    detected_mood: str
+    confidence: float | None
+    created_at: datetime
+
+class MoodHistoryPage(BaseModel):
+    items: list[MoodHistoryItem]
+    next_cursor: str | None
+
+class MoodStat(BaseModel):
+    mood: str
+    count: int
+    percent: float
+
+class MoodStats(BaseModel):
+    total_moods: int
+    total_tracks_logged: int
+    moods: list[MoodStat]
+
+class TrackItem(BaseModel):
+    track_name: str
+    artist: str | None
+    album: str | None
+    image: str | None
+    mood: str | None
+    time: datetime
+
+# -----------------------------------------------------------------------------
+# -- Request Schemas
+# -----------------------------------------------------------------------------
+
+EMOJI_BATCH_MAX = int(os.getenv("EMOJI_BATCH_MAX", "500"))
+
+class EmojiCheckIn(BaseModel):
+    emoji: str
+    created_at: datetime
+
+class EmojiBatch(BaseModel):
+    # Checked before the entries themselves are validated.
+    entries: list[EmojiCheckIn] = Field(max_length=EMOJI_BATCH_MAX)
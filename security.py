@@ -42,12 +42,17 @@ def issue_session_jwt(spotify_id: str, ttl_sec: int = 60 * 60 * 24 * 30) -> str:
 
     return jwt.encode(payload, SESSION_SECRET, algorithm="HS256")
 
-def verify_session_jwt(token: str) -> Optional[str]:
+def decode_session_jwt(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, SESSION_SECRET, algorithms=["HS256"], options={"require": ["exp", "iat"]})
         if payload.get("iss") != ISS or payload.get("sub") != "session":
             return None
 
-        return payload.get("spotify_id")
+        return payload
     except jwt.PyJWTError:
         return None
+
+def verify_session_jwt(token: str) -> Optional[str]:
+    payload = decode_session_jwt(token)
+
+    return payload.get("spotify_id") if payload else None
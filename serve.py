@@ -0,0 +1,141 @@
+# Imports
+import argparse, gc, os, signal, socket, sys, time
+
+# -----------------------------------------------------------------------------
+# -- Preforking Server
+#
+# Imports the app and loads the emotion model once in this process, then forks
+# N uvicorn workers on one shared listening socket. The workers inherit the
+# model weights copy-on-write instead of each loading their own copy.
+#
+#   alembic upgrade head && EMOTION_BACKEND=onnx python serve.py --workers 4 --port $PORT
+#
+# Only ONNX Runtime is preloaded: with a single intra-op thread it starts no
+# thread pool, so a session built before fork() keeps working in the children.
+# TensorFlow's thread pools do not survive a fork, so with the deepface backend
+# each worker still loads its own model (the imported app is shared either way).
+# -----------------------------------------------------------------------------
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+FORK_SAFE_BACKENDS = {"onnx"}
+RESTART_DELAY_SEC = 1.0
+
+def _configure_preload() -> None:
+    # Inference runs in each worker, on the preloaded model; a spawned inference pool would load
+    # its own copy. Runtime thread pools are kept out of the parent so there is nothing to break.
+    os.environ["INFERENCE_WORKERS"] = "0"
+    os.environ["EMOTION_ONNX_THREADS"] = "1"
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+def _preload(load_model: bool):
+    from main import app
+    from emotion_service import emotion_service
+
+    if load_model:
+        import cv2
+
+        cv2.setNumThreads(1)
+        start = time.perf_counter()
+        emotion_service.load()
+        print(f"Loaded {emotion_service.name} emotion model in {time.perf_counter() - start:.1f}s")
+
+    # Move everything imported so far out of the collector's reach; otherwise the first GC pass in
+    # each worker writes to every object header and un-shares the pages.
+    gc.collect()
+    gc.freeze()
+
+    return app
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+
+    return sock
+
+def _run_worker(app, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+    from database import reset_after_fork
+
+    code = 0
+    try:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        reset_after_fork()
+
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        server.run(sockets=[sock])
+    except BaseException as e:
+        print(f"Worker {os.getpid()} crashed:", e)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        # Never fall back into the parent's supervisor loop.
+        os._exit(code)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the API from N forked workers sharing one preloaded model.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-preload", action="store_true", help="load the model in each worker instead")
+    args = parser.parse_args()
+
+    backend = os.getenv("EMOTION_BACKEND", "deepface")
+    preload = not args.no_preload and backend in FORK_SAFE_BACKENDS
+    if preload:
+        _configure_preload()
+    elif not args.no_preload:
+        print(f"EMOTION_BACKEND={backend} is not fork-safe; each worker loads its own model.")
+
+    app = _preload(load_model=preload)
+    sock = _listen(args.host, args.port, args.backlog)
+
+    children: dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, args.log_level)
+        children[pid] = slot
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(max(1, args.workers)):
+        spawn(slot)
+    print(f"Serving on {args.host}:{args.port} with {len(children)} workers (preloaded: {preload})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting.")
+        time.sleep(RESTART_DELAY_SEC)
+        if not stopping:
+            spawn(slot)
+
+    sock.close()
+
+if __name__ == "__main__":
+    main()
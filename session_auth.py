@@ -0,0 +1,102 @@
+# Imports
+from dataclasses import dataclass
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from database import get_async_db
+from models import User
+from security import decode_session_jwt
+
+import os, threading, time
+
+# -----------------------------------------------------------------------------
+# -- Session Auth
+# -----------------------------------------------------------------------------
+
+COOKIE_NAME = "ss_session"
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SEC = int(os.getenv("SESSION_CACHE_TTL_SEC", "300"))
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: int
+    spotify_id: str
+    display_name: str | None
+    auto_create_enabled: bool
+
+@dataclass(frozen=True)
+class _CachedSession:
+    claims: dict
+    user: UserSnapshot
+    generation: int
+
+_sessions = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL_SEC)
+
+# Bumping a user's generation invalidates every cached session for them without having to
+# track which tokens belong to whom.
+_generations: dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+def _generation(spotify_id: str) -> int:
+    with _generations_lock:
+        return _generations.get(spotify_id, 0)
+
+def invalidate_user(spotify_id: str) -> None:
+    with _generations_lock:
+        _generations[spotify_id] = _generations.get(spotify_id, 0) + 1
+
+def invalidate_session(token: str | None) -> None:
+    if token:
+        _sessions.pop(token)
+
+async def current_user(request: Request, db: AsyncSession = Depends(get_async_db)) -> UserSnapshot:
+    token = request.cookies.get(COOKIE_NAME)
+    if not token:
+        raise HTTPException(status_code=401, detail="Login required.")
+
+    cached: _CachedSession | None = _sessions.get(token)
+    if cached and cached.generation == _generation(cached.user.spotify_id):
+        return cached.user
+
+    claims = decode_session_jwt(token)
+    spotify_id = claims.get("spotify_id") if claims else None
+    if not spotify_id:
+        raise HTTPException(status_code=401, detail="Invalid session.")
+
+    generation = _generation(spotify_id)
+    row = (await db.execute(
+        select(User.id, User.spotify_id, User.display_name, User.auto_create_enabled)
+        .where(User.spotify_id == spotify_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=401, detail="User not found.")
+
+    snapshot = UserSnapshot(
+        id=row.id, spotify_id=row.spotify_id, display_name=row.display_name,
+        auto_create_enabled=bool(row.auto_create_enabled),
+    )
+    ttl = min(SESSION_CACHE_TTL_SEC, claims["exp"] - time.time())
+    if ttl > 0:
+        _sessions.set(token, _CachedSession(claims=claims, user=snapshot, generation=generation), ttl=ttl)
+
+    return snapshot
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ("display_name", "auto_create_enabled")):
+        # Bumped only once the change commits: bumping at flush would let a concurrent request
+        # cache the old row under the new generation.
+        state.session.info.setdefault("session_users", set()).add(target.spotify_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users(session: Session) -> None:
+    for spotify_id in session.info.pop("session_users", ()):
+        invalidate_user(spotify_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_users(session: Session) -> None:
+    session.info.pop("session_users", None)
@@ -0,0 +1,244 @@
+# Imports
+import os, asyncio, random, time
+import httpx
+
+from metrics import observe_spotify, observe_spotify_retry, observe_spotify_short_circuit
+
+# -----------------------------------------------------------------------------
+# -- Spotify Client
+# -----------------------------------------------------------------------------
+
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+
+# Per-endpoint (connect, read) budgets. Currently-playing is best-effort logging, so it gets the
+# tightest budget; the token endpoint gates login and refresh, so it gets the most slack.
+TIMEOUTS = {
+    "token": httpx.Timeout(10.0, connect=3.0),
+    "me": httpx.Timeout(5.0, connect=3.0),
+    "currently_playing": httpx.Timeout(2.0, connect=1.0),
+    "create_playlist": httpx.Timeout(8.0, connect=3.0),
+    "unfollow_playlist": httpx.Timeout(5.0, connect=3.0),
+}
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("SPOTIFY_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("SPOTIFY_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+SPOTIFY_RATE_PER_SEC = float(os.getenv("SPOTIFY_RATE_PER_SEC", "10"))
+SPOTIFY_BURST = int(os.getenv("SPOTIFY_BURST", "20"))
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "2"))
+SPOTIFY_BACKOFF_BASE_SEC = float(os.getenv("SPOTIFY_BACKOFF_BASE_SEC", "0.25"))
+SPOTIFY_MAX_RETRY_AFTER_SEC = float(os.getenv("SPOTIFY_MAX_RETRY_AFTER_SEC", "10"))   # longer waits fail instead
+SPOTIFY_BREAKER_THRESHOLD = int(os.getenv("SPOTIFY_BREAKER_THRESHOLD", "5"))
+SPOTIFY_BREAKER_COOLDOWN_SEC = float(os.getenv("SPOTIFY_BREAKER_COOLDOWN_SEC", "30"))
+
+# Login and token refresh wait out limits and ignore the breaker; background calls (track logging,
+# playlist creation on the job queue) fail fast instead and get retried later.
+CRITICAL_ENDPOINTS = {"token", "me"}
+
+class SpotifyUnavailable(httpx.HTTPError):
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    # Shared by every request in the process; Retry-After from a 429 pauses the whole bucket,
+    # since Spotify rate-limits per app, not per user.
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def blocked_for(self) -> float:
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+
+                await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "tokens": round(min(self.burst, self._tokens + (time.monotonic() - self._updated) * self.rate), 2),
+            "blocked_for_sec": round(self.blocked_for(), 2),
+        }
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+
+        return "half_open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def retry_in(self) -> float:
+        return 0.0 if self._opened_at is None else max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            # Let one probe through and restart the cooldown; its outcome closes or re-opens the breaker.
+            self._opened_at = time.monotonic()
+            return True
+
+        return state == "closed"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold or self._opened_at is not None:
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "retry_in_sec": round(self.retry_in(), 2)}
+
+def _retry_after(r: httpx.Response) -> float:
+    try:
+        return max(0.0, float(r.headers.get("Retry-After", "1")))
+    except ValueError:
+        return 1.0
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, SPOTIFY_BACKOFF_BASE_SEC * 2 ** attempt)
+
+class SpotifyClient:
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self.limiter = TokenBucket(SPOTIFY_RATE_PER_SEC, SPOTIFY_BURST)
+        self.breaker = CircuitBreaker(SPOTIFY_BREAKER_THRESHOLD, SPOTIFY_BREAKER_COOLDOWN_SEC)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=POOL_LIMITS, http2=_http2_available())
+
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {"breaker": self.breaker.stats(), "limiter": self.limiter.stats()}
+
+    async def _request(self, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        critical = endpoint in CRITICAL_ENDPOINTS
+        if not critical and not self.breaker.allow():
+            observe_spotify_short_circuit(endpoint)
+            raise SpotifyUnavailable("Spotify circuit breaker is open.", retry_after=self.breaker.retry_in())
+
+        # 5xx and connection errors are only retried for reads; a retried POST could create twice.
+        idempotent = method == "GET"
+        attempt = 0
+        while True:
+            if not critical and self.limiter.blocked_for() > 0:
+                observe_spotify_short_circuit(endpoint)
+                raise SpotifyUnavailable("Spotify rate limit in effect.", retry_after=self.limiter.blocked_for())
+
+            await self.limiter.acquire()
+            start = time.perf_counter()
+            status = "error"
+            try:
+                r = await self.http.request(method, url, timeout=TIMEOUTS[endpoint], **kwargs)
+                status = str(r.status_code)
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if not idempotent or attempt >= SPOTIFY_MAX_RETRIES:
+                    raise
+                observe_spotify_retry(endpoint, "transport")
+                await asyncio.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            finally:
+                observe_spotify(endpoint, status, time.perf_counter() - start)
+
+            if r.status_code == 429:
+                retry_after = _retry_after(r)
+                self.limiter.block_for(retry_after)
+                self.breaker.record_failure()
+                if not critical or attempt >= SPOTIFY_MAX_RETRIES or retry_after > SPOTIFY_MAX_RETRY_AFTER_SEC:
+                    raise SpotifyUnavailable("Spotify rate limit exceeded.", retry_after=retry_after)
+                # The limiter now holds every caller until Retry-After has passed.
+                observe_spotify_retry(endpoint, "rate_limited")
+                attempt += 1
+                continue
+
+            if r.status_code >= 500:
+                self.breaker.record_failure()
+                if idempotent and attempt < SPOTIFY_MAX_RETRIES:
+                    observe_spotify_retry(endpoint, "server_error")
+                    await asyncio.sleep(_backoff(attempt))
+                    attempt += 1
+                    continue
+                return r
+
+            self.breaker.record_success()
+            return r
+
+    async def request_token(self, data: dict) -> httpx.Response:
+        return await self._request("token", "POST", f"{SPOTIFY_ACCOUNTS_URL}/api/token", data=data)
+
+    async def get_me(self, access_token: str) -> httpx.Response:
+        return await self._request("me", "GET", f"{SPOTIFY_API_URL}/me", headers=_bearer(access_token))
+
+    async def get_currently_playing(self, access_token: str) -> httpx.Response:
+        return await self._request(
+            "currently_playing", "GET", f"{SPOTIFY_API_URL}/me/player/currently-playing", headers=_bearer(access_token)
+        )
+
+    async def create_playlist(self, access_token: str, spotify_id: str, payload: dict) -> httpx.Response:
+        return await self._request(
+            "create_playlist", "POST", f"{SPOTIFY_API_URL}/users/{spotify_id}/playlists",
+            headers=_bearer(access_token), json=payload
+        )
+
+    async def unfollow_playlist(self, access_token: str, playlist_id: str) -> httpx.Response:
+        # Spotify has no playlist delete; unfollowing removes it from the owner's library.
+        return await self._request(
+            "unfollow_playlist", "DELETE", f"{SPOTIFY_API_URL}/playlists/{playlist_id}/followers",
+            headers=_bearer(access_token)
+        )
+
+def _bearer(access_token: str) -> dict:
+    return {"Authorization": f"Bearer {access_token}"}
+
+spotify = SpotifyClient()
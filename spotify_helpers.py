@@ -1,9 +1,16 @@
 # Imports
-from sqlalchemy.orm import Session
-from security import encrypt_token, decrypt_token
-from models import User, Playlist
-
-import os, datetime, requests
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import User, Playlist, MoodEntry
+from playlist_registry import PlaylistRef, playlist_registry
+from session_auth import UserSnapshot
+from spotify_client import SpotifyUnavailable, spotify
+from token_manager import token_manager
+from live_events import live_events
+from jobs import PermanentJobError
+
+import os, httpx
 
 # -----------------------------------------------------------------------------
 # -- Spotify Helpers
@@ -13,79 +20,92 @@ SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "https://synaptic-sound.com/callback")
 
-def GetOrCreateUser(spotify_id: str, db: Session, display_name=None) -> User:
-    user = db.query(User).filter_by(spotify_id=spotify_id).first()
+# Spotify answers these the same way however often we ask (missing scope, unknown user).
+PLAYLIST_REJECTED_STATUSES = {400, 403, 404}
+
+class PlaylistCreationRejected(PermanentJobError):
+    pass
+
+async def GetOrCreateUser(spotify_id: str, db: AsyncSession, display_name=None) -> User:
+    user = (await db.execute(select(User).where(User.spotify_id == spotify_id))).scalars().first()
     if not user:
         user = User(spotify_id=spotify_id, display_name=display_name)
-        db.add(user); db.commit(); db.refresh(user)
+        db.add(user); await db.commit(); await db.refresh(user)
 
     return user
 
-def _get_refresh_token(user: User) -> str | None:
-    if not user.refresh_token_enc:
-        return None
-
-    return decrypt_token(user.refresh_token_enc)
-
-def _set_refresh_token(user: User, refresh_token: str, db: Session) -> None:
-    user.refresh_token_enc = encrypt_token(refresh_token)
-    db.commit(); db.refresh(user)
-
-def EnsureFreshAccessToken(user: User, db: Session) -> str | None:
-    if user.access_token and user.token_expires_at:
-        delta = (user.token_expires_at - datetime.datetime.now()).total_seconds()
-        if delta > 300:   # > 5 minutes left
-            return user.access_token
-
-    refresh_token = _get_refresh_token(user)
-    if not refresh_token:
-        return None
-
-    r = requests.post(
-        "https://accounts.spotify.com/api/token",
-        data={
-            "grant_type": "refresh_token",
-            "refresh_token": refresh_token,
-            "client_id": SPOTIFY_CLIENT_ID,
-            "client_secret": SPOTIFY_CLIENT_SECRET,
-        },
-    )
+async def EnsureFreshAccessToken(user: User | UserSnapshot, db: AsyncSession) -> str | None:
+    return await token_manager.get_access_token(user.id, db)
 
-    if r.status_code != 200:
+async def AutoCreatePlaylistIfEnabled(user: User | UserSnapshot, mood: str, db: AsyncSession, entry_id: int | None = None) -> str | None:
+    if not user.auto_create_enabled:
         return None
 
-    data = r.json()
-    user.access_token = data.get("access_token")
-    if data.get("refresh_token"):
-        _set_refresh_token(user, data["refresh_token"], db)
+    async with playlist_registry.lock(user.id, mood):
+        ref = await playlist_registry.lookup(db, user.id, mood)
+        if ref is None:
+            ref = await _create_mood_playlist(user, mood, db, entry_id)
+            if ref is None:
+                return None
 
-    user.token_expires_at = datetime.datetime.now() + datetime.timedelta(seconds=data.get("expires_in", 3600))
-    db.commit(); db.refresh(user)
+        if entry_id is not None:
+            await db.execute(update(MoodEntry).where(MoodEntry.id == entry_id).values(playlist_id=ref.id))
+        live_events.publish_after_commit(db, user.id, [("playlist", {"mood": mood, "url": ref.url, "entry_id": entry_id})])
+        await db.commit()
 
-    return user.access_token
+    return ref.url
 
-def AutoCreatePlaylistIfEnabled(user: User, mood: str, db: Session) -> str | None:
-    if not user.auto_create_enabled:
-        return None
-
-    token = EnsureFreshAccessToken(user, db)
+async def _create_mood_playlist(user: User | UserSnapshot, mood: str, db: AsyncSession, entry_id: int | None) -> PlaylistRef | None:
+    token = await EnsureFreshAccessToken(user, db)
     if not token:
+        if not await db.scalar(select(User.refresh_token_enc).where(User.id == user.id)):
+            raise PlaylistCreationRejected("No Spotify refresh token; the user has to log in again.")
         return None
 
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     name = f"{mood.capitalize()} Vibes 🎧"
     payload = {"name": name, "description": f"Synaptic Sound - mood: {mood}", "public": True}
-    r = requests.post(f"https://api.spotify.com/v1/users/{user.spotify_id}/playlists", headers=headers, json=payload)
+    try:
+        r = await spotify.create_playlist(token, user.spotify_id, payload)
+    except SpotifyUnavailable:
+        # Let the job queue reschedule it after Retry-After / the breaker cooldown.
+        raise
+    except httpx.HTTPError as e:
+        print("Spotify playlist creation failed:", e)
+        return None
+
+    if r.status_code in PLAYLIST_REJECTED_STATUSES:
+        raise PlaylistCreationRejected(f"Spotify rejected playlist creation: {r.status_code}")
     if r.status_code not in (200, 201):
+        print("Spotify playlist creation failed:", r.status_code)
         return None
 
     pl = r.json()
     rec = Playlist(
         user_id=user.id,
+        mood_id=entry_id,
+        detected_mood=mood,
+        spotify_playlist_id=pl.get("id"),
         playlist_name=pl["name"],
         playlist_url=pl["external_urls"]["spotify"],
     )
 
-    db.add(rec); db.commit(); db.refresh(rec)
-
-    return rec.playlist_url
\ No newline at end of file
+    try:
+        async with db.begin_nested():
+            db.add(rec); await db.flush()
+    except IntegrityError:
+        # Another process created this mood's playlist first; use theirs and drop ours.
+        await _unfollow_playlist(token, pl.get("id"))
+        return await playlist_registry.lookup(db, user.id, mood)
+
+    return playlist_registry.remember(user.id, mood, PlaylistRef(id=rec.id, url=rec.playlist_url))
+
+async def _unfollow_playlist(token: str, playlist_id: str | None) -> None:
+    if not playlist_id:
+        return
+
+    try:
+        r = await spotify.unfollow_playlist(token, playlist_id)
+        if r.status_code != 200:
+            print("Spotify playlist cleanup failed:", r.status_code)
+    except (SpotifyUnavailable, httpx.HTTPError) as e:
+        print("Spotify playlist cleanup failed:", e)
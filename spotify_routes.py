@@ -1,12 +1,12 @@
 # Imports
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from spotify_helpers import EnsureFreshAccessToken
-from security import verify_session_jwt
+from session_auth import UserSnapshot, current_user
+from spotify_client import SpotifyUnavailable, spotify
 
-import requests
+import math, httpx
 
 # -------------------------------------------------------------------------
 # -- Spotify Routes
@@ -14,29 +14,34 @@ import requests
 
 router = APIRouter()
 
-def _auth_headers(user: User, db: Session):
-    token = EnsureFreshAccessToken(user, db)
+async def _access_token(user: UserSnapshot, db: AsyncSession) -> str:
+    token = await EnsureFreshAccessToken(user, db)
     if not token:
         raise HTTPException(status_code=401, detail="No token.")
 
-    return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-
-def _require_user(request: Request, db: Session) -> User:
-    token = request.cookies.get("ss_session")
-    sid = verify_session_jwt(token) if token else None
-    if not sid:
-        raise HTTPException(status_code=401, detail="Login required.")
-
-    user: User | None = db.query(User).filter_by(spotify_id=sid).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found.")
-
-    return user
+    return token
 
 @router.get("/me")
-def me(request: Request, db: Session = Depends(get_db)):
-    user = _require_user(request, db)
-    headers = _auth_headers(user, db)
-    r = requests.get("https://api.spotify.com/v1/me", headers=headers)
+async def me(user: UserSnapshot = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    token = await _access_token(user, db)
+    try:
+        r = await spotify.get_me(token)
+    except SpotifyUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail="Spotify is rate limiting us, try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after or 1))}
+        )
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Spotify unavailable.")
+
+    # Don't relay Spotify's error bodies as if they were a profile.
+    if r.status_code == 401:
+        raise HTTPException(status_code=401, detail="Spotify session expired.")
+    if r.status_code != 200:
+        raise HTTPException(status_code=502, detail="Spotify unavailable.")
 
     return r.json()
+
+@router.get("/status")
+def status():
+    return spotify.stats()
@@ -0,0 +1,62 @@
+# Imports
+from contextlib import contextmanager
+from pathlib import Path
+
+import base64, os, secrets, sys, tempfile
+import pytest
+
+# -----------------------------------------------------------------------------
+# -- Test Setup
+#
+# The app reads its configuration at import time, so the environment is set
+# before anything from the project is imported: a throwaway SQLite database
+# migrated to head, and no emotion model.
+#
+#   pip install pytest && python -m pytest -q tests
+# -----------------------------------------------------------------------------
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_db_dir = tempfile.mkdtemp(prefix="synaptic-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("ENCRYPTION_KEY", base64.b64encode(secrets.token_bytes(32)).decode())
+os.environ.setdefault("SESSION_SECRET", secrets.token_hex(32))
+os.environ["EMOTION_WARMUP"] = "0"
+os.environ["INFERENCE_WORKERS"] = "0"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event
+
+command.upgrade(Config(str(ROOT / "alembic.ini")), "head")
+
+from database import async_engine
+
+@pytest.fixture(scope="session")
+def app():
+    from main import app
+
+    return app
+
+class StatementCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+@contextmanager
+def count_statements():
+    counter = StatementCounter()
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    # Requests run on the async engine; its sync core sees every cursor execute.
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _before)
+    try:
+        yield counter
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _before)
@@ -0,0 +1,50 @@
+# Imports
+from emotion_service import EmotionResult
+
+import numpy as np
+import pytest
+
+import inference_batcher as batcher_module
+from inference_batcher import InferenceBatcher
+
+# -----------------------------------------------------------------------------
+# -- Inference Batcher
+#
+# A request that times out or disconnects cancels its future while it may still
+# be queued; the rest of its batch has to be answered regardless.
+# -----------------------------------------------------------------------------
+
+@pytest.fixture
+def batcher(monkeypatch):
+    seen: list[int] = []
+
+    def analyze_batch(imgs):
+        seen.append(len(imgs))
+        return [EmotionResult(mood=f"mood-{int(img[0, 0])}", confidence=1.0, inference_ms=0.0) for img in imgs]
+
+    monkeypatch.setattr(batcher_module.emotion_service, "analyze_batch", analyze_batch)
+    # Inline mode, with a wait long enough that every submit below lands in one batch.
+    b = InferenceBatcher(workers=0, max_batch_size=8, max_wait_ms=200)
+    b.seen = seen
+    yield b
+    b.stop()
+
+def _image(n: int) -> np.ndarray:
+    return np.full((2, 2), n, dtype=np.uint8)
+
+def test_cancelled_member_does_not_break_its_batch(batcher):
+    futures = [batcher.submit(_image(i)) for i in range(3)]
+    assert futures[1].cancel()
+
+    assert futures[0].result(timeout=5).mood == "mood-0"
+    assert futures[2].result(timeout=5).mood == "mood-2"
+    assert futures[1].cancelled()
+    assert batcher.seen == [2]
+
+def test_fully_cancelled_batch_keeps_the_batcher_running(batcher):
+    for f in [batcher.submit(_image(i)) for i in range(2)]:
+        f.cancel()
+
+    after = batcher.submit(_image(7))
+    assert after.result(timeout=5).mood == "mood-7"
+    assert batcher.stats()["in_flight"] == 0
@@ -0,0 +1,23 @@
+# Imports
+from datetime import datetime, timedelta, timezone
+from insights import insights_from_rows
+
+import pytest
+
+# -----------------------------------------------------------------------------
+# -- Mood Insights
+#
+# The rolling shares always cover the requested days up to today, however
+# sparse or old the user's history is.
+# -----------------------------------------------------------------------------
+
+@pytest.mark.parametrize("ages", [[400], [2], [0, 3, 30, 200]])
+def test_rolling_shares_cover_every_requested_day(ages):
+    now = datetime.now(timezone.utc)
+    rows = [(now - timedelta(days=age), "happy" if age % 2 else "sad", None) for age in sorted(ages, reverse=True)]
+
+    rolling = insights_from_rows(rows, "UTC", window=7, days=90)["rolling"]
+
+    assert len(rolling["days"]) == 90
+    assert rolling["days"][-1] == now.date().isoformat()
+    assert all(len(shares) == 90 for shares in rolling["shares"].values())
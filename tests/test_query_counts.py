@@ -0,0 +1,124 @@
+# Imports
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from conftest import count_statements
+
+import secrets
+import pytest
+
+# -----------------------------------------------------------------------------
+# -- Read Endpoint Statement Counts
+#
+# Every read endpoint is one statement, however much history the user has;
+# resolving the session cookie adds one more the first time it is seen.
+# -----------------------------------------------------------------------------
+
+ENTRIES = 60
+TRACKS = 30
+
+@pytest.fixture(scope="module")
+def user():
+    import rollups  # noqa: F401 -- keeps the rollup tables in step with the seeded rows
+    from database import SessionLocal
+    from models import MoodEntry, Track, TrackLog, User, utcnow
+    from security import issue_session_jwt
+
+    now = utcnow()
+    with SessionLocal() as db:
+        user = User(spotify_id=f"test-{secrets.token_hex(4)}", display_name="Test")
+        db.add(user); db.flush()
+
+        moods = ["happy", "sad", "chill"]
+        entries = [
+            MoodEntry(user_id=user.id, emoji="😊", detected_mood=moods[i % 3], created_at=now - timedelta(hours=i))
+            for i in range(ENTRIES)
+        ]
+        db.add_all(entries); db.flush()
+
+        db.add_all([Track(id=f"trk{i}", name=f"Track {i}", artist_name=f"Artist {i % 4}") for i in range(TRACKS)])
+        db.add_all([
+            TrackLog(user_id=user.id, mood_id=entries[i].id, track_id=f"trk{i}", created_at=now - timedelta(hours=i))
+            for i in range(TRACKS)
+        ])
+        db.commit()
+
+        return issue_session_jwt(user.spotify_id)
+
+@pytest.fixture
+def client(app, user):
+    from session_auth import COOKIE_NAME
+
+    # Not entered as a context manager: the lifespan's background workers would add statements.
+    client = TestClient(app)
+    client.cookies.set(COOKIE_NAME, user)
+
+    return client
+
+def _statements(client: TestClient, path: str) -> int:
+    with count_statements() as counter:
+        response = client.get(path)
+    assert response.status_code == 200, response.text
+
+    return counter.count
+
+def test_session_lookup_is_one_statement_then_cached(app):
+    from security import issue_session_jwt
+    from session_auth import COOKIE_NAME
+    from database import SessionLocal
+    from models import User
+
+    spotify_id = f"test-{secrets.token_hex(4)}"
+    with SessionLocal() as db:
+        db.add(User(spotify_id=spotify_id)); db.commit()
+
+    client = TestClient(app)
+    client.cookies.set(COOKIE_NAME, issue_session_jwt(spotify_id))
+
+    assert _statements(client, "/auth/session") == 1
+    assert _statements(client, "/auth/session") == 0
+
+@pytest.mark.parametrize("path", [
+    "/mood/history",
+    "/mood/history?days=7&limit=10",
+    "/mood/history?format=ndjson",
+    "/mood/stats",
+    "/mood/trends",
+    "/mood/tracks",
+])
+def test_read_endpoint_is_one_statement(client, path):
+    client.get("/auth/session")     # warm the session cache
+
+    assert _statements(client, path) == 1
+
+def test_history_next_page_is_one_statement(client):
+    client.get("/auth/session")
+    cursor = client.get("/mood/history?limit=10").headers["X-Next-Cursor"]
+    assert cursor
+
+    assert _statements(client, f"/mood/history?limit=10&cursor={cursor}") == 1
+
+def test_history_without_limit_is_the_whole_list(client):
+    client.get("/auth/session")
+    response = client.get("/mood/history")
+
+    assert len(response.json()) == ENTRIES
+    assert "X-Next-Cursor" not in response.headers
+
+def test_history_pages_cover_the_whole_list(client):
+    client.get("/auth/session")
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = client.get(f"/mood/history?limit=25{'&cursor=' + cursor if cursor else ''}")
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+
+    assert ids == [item["id"] for item in client.get("/mood/history").json()]
+
+def test_tracks_do_not_lazy_load_moods(client):
+    client.get("/auth/session")
+    with count_statements() as counter:
+        tracks = client.get("/mood/tracks").json()
+
+    assert len(tracks) == 20
+    assert all(t["mood"] for t in tracks)
+    assert counter.count == 1
@@ -0,0 +1,157 @@
+# Imports
+from collections import defaultdict
+from dataclasses import dataclass
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import TTLCache
+from database import AsyncSessionLocal
+from models import User
+from security import encrypt_token, decrypt_token
+from spotify_client import spotify
+
+import os, asyncio, datetime, httpx
+
+# -----------------------------------------------------------------------------
+# -- Spotify Access Token Manager
+# -----------------------------------------------------------------------------
+
+SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
+SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
+
+REFRESH_MARGIN_SEC = 300     # hot path refreshes when < 5 minutes left
+PROACTIVE_MARGIN_SEC = int(os.getenv("TOKEN_PROACTIVE_REFRESH_SEC", "600"))
+SWEEP_INTERVAL_SEC = int(os.getenv("TOKEN_SWEEP_INTERVAL_SEC", "60"))
+ACTIVE_WINDOW_SEC = int(os.getenv("TOKEN_ACTIVE_WINDOW_SEC", "1800"))
+
+@dataclass(frozen=True)
+class CachedToken:
+    access_token: str
+    expires_at: datetime.datetime
+
+    def seconds_left(self) -> float:
+        return (self.expires_at - datetime.datetime.now()).total_seconds()
+
+class TokenManager:
+    def __init__(self):
+        cache_size = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+        self._cache = TTLCache(maxsize=cache_size, ttl=3600)
+        # Users seen recently; only these get refreshed in the background.
+        self._active = TTLCache(maxsize=cache_size, ttl=ACTIVE_WINDOW_SEC)
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._task: asyncio.Task | None = None
+
+    def store(self, user_id: int, access_token: str, expires_at: datetime.datetime) -> None:
+        self._cache.set(user_id, CachedToken(access_token, expires_at))
+
+    def forget(self, user_id: int) -> None:
+        self._cache.pop(user_id)
+
+    async def get_access_token(self, user_id: int, db: AsyncSession) -> str | None:
+        self._active.set(user_id, True)
+        cached = self._cache.get(user_id)
+        if cached and cached.seconds_left() > REFRESH_MARGIN_SEC:
+            return cached.access_token
+
+        # Single flight: concurrent callers for the same user wait here, then find the token
+        # the first caller refreshed instead of each POSTing to /api/token.
+        async with self._locks[user_id]:
+            cached = self._cache.get(user_id)
+            if cached and cached.seconds_left() > REFRESH_MARGIN_SEC:
+                return cached.access_token
+
+            user = await db.get(User, user_id)
+            if user is None:
+                return None
+
+            if user.access_token and user.token_expires_at:
+                stored = CachedToken(user.access_token, user.token_expires_at)
+                if stored.seconds_left() > REFRESH_MARGIN_SEC:
+                    self._cache.set(user.id, stored)
+                    return stored.access_token
+
+            return await self._refresh(user, db)
+
+    async def _refresh(self, user: User, db: AsyncSession) -> str | None:
+        if not user.refresh_token_enc:
+            return None
+
+        try:
+            r = await spotify.request_token({
+                "grant_type": "refresh_token",
+                "refresh_token": decrypt_token(user.refresh_token_enc),
+                "client_id": SPOTIFY_CLIENT_ID,
+                "client_secret": SPOTIFY_CLIENT_SECRET,
+            })
+        except httpx.HTTPError as e:
+            print("Spotify token refresh failed:", e)
+            return None
+
+        if r.status_code != 200:
+            if r.status_code == 400 and "invalid_grant" in r.text:
+                # Revoked or expired for good; only a new login brings a working one.
+                user.refresh_token_enc = None
+                await db.commit()
+            return None
+
+        data = r.json()
+        access_token = data.get("access_token")
+        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=data.get("expires_in", 3600))
+
+        user.access_token = access_token
+        user.token_expires_at = expires_at
+        if data.get("refresh_token"):
+            user.refresh_token_enc = encrypt_token(data["refresh_token"])
+        await db.commit()
+
+        if access_token:
+            self._cache.set(user.id, CachedToken(access_token, expires_at))
+
+        return access_token
+
+    # Background sweep: refresh tokens that will cross the 5-minute threshold soon, so requests
+    # almost never pay for a refresh round trip themselves.
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sweep_loop(), name="token-refresher")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SEC)
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                print("Token refresh sweep failed:", e)
+
+    async def refresh_expiring(self) -> None:
+        due = [uid for uid, tok in self._cache.items() if tok.seconds_left() < PROACTIVE_MARGIN_SEC]
+        if not due:
+            return
+
+        async with AsyncSessionLocal() as db:
+            for user_id in due:
+                async with self._locks[user_id]:
+                    cached = self._cache.get(user_id)
+                    if cached and cached.seconds_left() >= PROACTIVE_MARGIN_SEC:
+                        continue
+
+                    if self._active.get(user_id) is None:
+                        self.forget(user_id)
+                        continue
+
+                    user = await db.get(User, user_id)
+                    if user is None:
+                        self.forget(user_id)
+                        continue
+
+                    if not await self._refresh(user, db):
+                        self.forget(user_id)
+
+token_manager = TokenManager()
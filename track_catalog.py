@@ -0,0 +1,86 @@
+# Imports
+from dataclasses import dataclass
+from sqlalchemy import event, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from models import Track, utcnow
+
+import os
+
+# -----------------------------------------------------------------------------
+# -- Track Catalog
+#
+# track_logs rows only reference a track id; names, artists and artwork live
+# once in `tracks`. Hot ids are remembered after their upsert commits, so a
+# popular track costs one catalog write per process, not one per play.
+# -----------------------------------------------------------------------------
+
+TRACK_CACHE_SIZE = int(os.getenv("TRACK_CACHE_SIZE", "50000"))
+TRACK_CACHE_TTL_SEC = int(os.getenv("TRACK_CACHE_TTL_SEC", "86400"))
+
+@dataclass(frozen=True)
+class TrackInfo:
+    id: str
+    name: str
+    artist_name: str | None
+    album_name: str | None
+    album_image: str | None
+    spotify_url: str | None
+
+def track_from_item(item: dict) -> TrackInfo:
+    images = item.get("album", {}).get("images") or [{}]
+
+    return TrackInfo(
+        id=item["id"],
+        name=item["name"],
+        artist_name=", ".join(a["name"] for a in item.get("artists", [])) or None,
+        album_name=item.get("album", {}).get("name"),
+        album_image=images[0].get("url"),
+        spotify_url=item.get("external_urls", {}).get("spotify"),
+    )
+
+class TrackCatalog:
+    def __init__(self):
+        self._cache = TTLCache(maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL_SEC)
+
+    async def ensure(self, db: AsyncSession, info: TrackInfo) -> None:
+        if self._cache.get(info.id) == info:
+            return
+
+        insert_fn = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        stmt = insert_fn(Track).values(
+            id=info.id, name=info.name, artist_name=info.artist_name, album_name=info.album_name,
+            album_image=info.album_image, spotify_url=info.spotify_url,
+        )
+        fields = ("name", "artist_name", "album_name", "album_image", "spotify_url")
+        # Only rewrite the row when Spotify's metadata actually changed.
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={**{f: stmt.excluded[f] for f in fields}, "updated_at": utcnow()},
+            where=or_(*(Track.__table__.c[f].is_distinct_from(stmt.excluded[f]) for f in fields)),
+        )
+        await db.execute(stmt)
+
+        # Cache only once the row is committed; a rolled-back upsert must not be remembered.
+        db.sync_session.info.setdefault("catalog_pending", {})[info.id] = info
+
+    def remember(self, infos) -> None:
+        for info in infos:
+            self._cache.set(info.id, info)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+track_catalog = TrackCatalog()
+
+@event.listens_for(Session, "after_commit")
+def _remember_committed(session: Session) -> None:
+    track_catalog.remember(session.info.pop("catalog_pending", {}).values())
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction) -> None:
+    # Savepoint rollbacks included: which upserts they undid isn't tracked, so drop them all.
+    session.info.pop("catalog_pending", None)